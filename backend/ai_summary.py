@@ -1,58 +1,394 @@
+import asyncio
+import hashlib
+import logging
 import os
-from openai import OpenAI
+import httpx
+from openai import OpenAI, AsyncOpenAI
 from dotenv import load_dotenv
-from typing import List
+from datetime import date, datetime
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
 import models
-# from . import models
+# from . import models, fake_llm, metrics, summary_cache
 import models
+import fake_llm
+import metrics
+import summary_cache
+
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "30"))
+# Upper bound on completions in flight at once across all requests
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+
+# Prompts estimated above SUMMARY_TOKEN_BUDGET are summarized map-reduce style:
+# the todos are split into chunks of about SUMMARY_CHUNK_TOKENS, at most
+# SUMMARY_MAP_CONCURRENCY chunks are summarized at once, then the partial
+# summaries are combined
+SUMMARY_TOKEN_BUDGET = int(os.getenv("SUMMARY_TOKEN_BUDGET", "3000"))
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "1500"))
+SUMMARY_MAP_CONCURRENCY = int(os.getenv("SUMMARY_MAP_CONCURRENCY", "4"))
+
+# "llm" asks the model and falls back to the local summary on failure,
+# "local" always answers from local_summary without calling the model
+SUMMARY_BACKEND = os.getenv("SUMMARY_BACKEND", "llm")
+# "compact" prompts with per-bucket counts from the database plus at most
+# SUMMARY_TOP_N overdue and upcoming titles, trimmed to SUMMARY_PROMPT_TOKENS;
+# "full" lists every todo
+SUMMARY_PROMPT = os.getenv("SUMMARY_PROMPT", "compact")
+SUMMARY_TOP_N = int(os.getenv("SUMMARY_TOP_N", "5"))
+SUMMARY_PROMPT_TOKENS = int(os.getenv("SUMMARY_PROMPT_TOKENS", "300"))
+# Overall time a request waits for the model before falling back
+LLM_SUMMARY_TIMEOUT = float(os.getenv("LLM_SUMMARY_TIMEOUT", "10"))
+
+LLM_TIMEOUT = httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+
 # Configure the OpenAI client
 client = OpenAI(
     api_key=os.getenv("OPENAI_API_KEY"),
     base_url=os.getenv("OPENAI_API_BASE"),
+    timeout=LLM_TIMEOUT,
 )
 
-def generate_summary(todos: List[models.Todo]) -> str:
+# Used by the request handlers so a pending completion doesn't hold a worker thread.
+# LLM_BACKEND=fake swaps in a local model for tests and load runs without a key.
+if os.getenv("LLM_BACKEND", "openai") == "fake":
+    async_client = fake_llm.FakeAsyncOpenAI(delay=float(os.getenv("FAKE_LLM_DELAY", "0.02")))
+else:
+    async_client = AsyncOpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        base_url=os.getenv("OPENAI_API_BASE"),
+        timeout=LLM_TIMEOUT,
+    )
+
+_llm_slots = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+# Completions currently running, keyed by prompt hash
+_in_flight: Dict[str, asyncio.Future] = {}
+
+NO_TODOS_MESSAGE = "You have no tasks. Enjoy your day!"
+ERROR_MESSAGE = "Sorry, I couldn't generate a summary at the moment. Please check your AI configuration."
+
+def todo_line(t: models.Todo) -> str:
+    return (
+        # f"- {t.title} (Due: {t.due_date.strftime('%Y-%m-%d')}, "
+        f"- {t.title} (Due: {t.due_date.strftime('%Y-%m-%d') if t.due_date else 'No due date'}, "
+        f"Status: {'Completed' if t.completed else 'Pending'})"
+    )
+
+def build_prompt(todos: List[models.Todo]) -> str:
     """
-    Generates a summary of the todos using an AI model.
+    Builds the summary prompt listing every todo.
     """
-    if not todos:
-        return "You have no tasks. Enjoy your day!"
-
     # Format the todos into a string for the prompt
-    todo_list_str = "\n".join(
-        [
-            (
-                # f"- {t.title} (Due: {t.due_date.strftime('%Y-%m-%d')}, "
-                f"- {t.title} (Due: {t.due_date.strftime('%Y-%m-%d') if t.due_date else 'No due date'}, "
-                f"Status: {'Completed' if t.completed else 'Pending'})")
-            for t in todos
-        ]
-    )
+    todo_list_str = "\n".join([todo_line(t) for t in todos])
 
     # Create the prompt
-    prompt = (
+    return (
         "You are a helpful assistant. Please provide a brief, friendly, and encouraging summary "
         "of the following tasks. Mention any overdue tasks first, then tasks due today, "
         "and finally any upcoming tasks. Keep the summary to a maximum of 3-4 sentences.\n\n"
         f"Here are the tasks:\n{todo_list_str}"
     )
 
+def build_map_prompt(todos: List[models.Todo]) -> str:
+    todo_list_str = "\n".join([todo_line(t) for t in todos])
+    return (
+        "The following tasks are one part of a longer task list. Summarize them factually in "
+        "2-3 sentences: how many are overdue, due today, upcoming, undated and completed, "
+        "and name the most urgent ones.\n\n"
+        f"Here are the tasks:\n{todo_list_str}"
+    )
+
+def build_reduce_prompt(partials: List[str]) -> str:
+    partial_str = "\n".join(f"- {p}" for p in partials)
+    return (
+        "You are a helpful assistant. The following are summaries of parts of one task list. "
+        "Combine them into a single brief, friendly, and encouraging summary. Mention any overdue "
+        "tasks first, then tasks due today, and finally any upcoming tasks. Keep the summary to a "
+        "maximum of 3-4 sentences.\n\n"
+        f"Here are the partial summaries:\n{partial_str}"
+    )
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count, about four characters per token for English text.
+    """
+    return len(text) // 4 + 1
+
+# Longest title quoted in a compact prompt, in characters
+COMPACT_TITLE_CHARS = 80
+
+def _compact_line(title: str, due_date: datetime) -> str:
+    if len(title) > COMPACT_TITLE_CHARS:
+        title = title[:COMPACT_TITLE_CHARS - 1] + "…"
+    return f"- {title} (Due: {due_date.strftime('%Y-%m-%d')})"
+
+def build_compact_prompt(
+    counts: Dict[str, int],
+    overdue: List[Tuple[str, datetime]],
+    upcoming: List[Tuple[str, datetime]],
+    today: date,
+    max_tokens: int = None,
+) -> str:
+    """
+    Builds the summary prompt from bucket counts and a few example titles.
+
+    counts maps the local_summary buckets (overdue, today, upcoming, undated,
+    completed) to todo counts. Titles are dropped from the end of the longer
+    list until the prompt fits max_tokens; the counts are always kept.
+    """
+    max_tokens = SUMMARY_PROMPT_TOKENS if max_tokens is None else max_tokens
+    overdue, upcoming = list(overdue), list(upcoming)
+    totals = (
+        f"{counts.get('overdue', 0)} overdue, {counts.get('today', 0)} due today, "
+        f"{counts.get('upcoming', 0)} upcoming, {counts.get('undated', 0)} without a due date, "
+        f"{counts.get('completed', 0)} completed"
+    )
+
+    def render() -> str:
+        sections = [
+            "You are a helpful assistant. Please provide a brief, friendly, and encouraging summary "
+            "of the following task list. Mention any overdue tasks first, then tasks due today, "
+            "and finally any upcoming tasks. Keep the summary to a maximum of 3-4 sentences.",
+            f"Today is {today.isoformat()}. Task counts: {totals}.",
+        ]
+        if overdue:
+            sections.append("Oldest overdue tasks:\n" + "\n".join(_compact_line(*t) for t in overdue))
+        if upcoming:
+            sections.append("Next tasks due:\n" + "\n".join(_compact_line(*t) for t in upcoming))
+        return "\n\n".join(sections)
+
+    prompt = render()
+    while estimate_tokens(prompt) > max_tokens and (overdue or upcoming):
+        (overdue if len(overdue) >= len(upcoming) else upcoming).pop()
+        prompt = render()
+    return prompt
+
+def chunk_by_tokens(items: List, render, max_tokens: int) -> List[List]:
+    """
+    Splits items into consecutive chunks whose rendered lines stay within
+    max_tokens. An item too large for any chunk gets a chunk of its own.
+    """
+    chunks, current, used = [], [], 0
+    for item in items:
+        cost = estimate_tokens(render(item))
+        if current and used + cost > max_tokens:
+            chunks.append(current)
+            current, used = [], 0
+        current.append(item)
+        used += cost
+    if current:
+        chunks.append(current)
+    return chunks
+
+def completion_params(prompt: str) -> dict:
+    return dict(
+        model=os.getenv("LLM_MODEL", "gpt-4o-mini"),
+        messages=[
+            {"role": "system", "content": "You are a helpful assistant."},
+            {"role": "user", "content": prompt},
+        ],
+        temperature=0.7,
+        max_tokens=150,
+    )
+
+def generate_summary(todos: List[models.Todo]) -> str:
+    """
+    Generates a summary of the todos using an AI model.
+    """
+    if not todos:
+        return NO_TODOS_MESSAGE
+
+    prompt = build_prompt(todos)
+
     try:
         # Make the API call
-        response = client.chat.completions.create(
-            model=os.getenv("LLM_MODEL", "gpt-4o-mini"),
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant."}, 
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0.7,
-            max_tokens=150,
-        )
+        response = client.chat.completions.create(**completion_params(prompt))
         return response.choices[0].message.content.strip()
     except Exception as e:
         # Handle potential API errors
         print(f"An error occurred: {e}")
-        return "Sorry, I couldn't generate a summary at the moment. Please check your AI configuration."
+        return ERROR_MESSAGE
+
+class PromptStats:
+    """
+    Running totals of prompts sent to the model: their size as sent and the
+    token usage the model reported back, to compare prompt modes.
+    """
+
+    def __init__(self):
+        self.prompts = 0
+        self.prompt_chars = 0
+        self.estimated_prompt_tokens = 0
+        self.last_estimated_prompt_tokens = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def record_prompt(self, prompt: str):
+        self.prompts += 1
+        self.prompt_chars += len(prompt)
+        self.last_estimated_prompt_tokens = estimate_tokens(prompt)
+        self.estimated_prompt_tokens += self.last_estimated_prompt_tokens
+
+    def record_usage(self, usage):
+        # Responses without usage (or test doubles) are left out of the totals
+        if isinstance(getattr(usage, "prompt_tokens", None), int):
+            self.prompt_tokens += usage.prompt_tokens
+            self.completion_tokens += usage.completion_tokens
+
+    def stats(self) -> dict:
+        return {
+            "mode": SUMMARY_PROMPT,
+            "prompts": self.prompts,
+            "prompt_chars": self.prompt_chars,
+            "avg_prompt_chars": self.prompt_chars / self.prompts if self.prompts else 0.0,
+            "estimated_prompt_tokens": self.estimated_prompt_tokens,
+            "last_estimated_prompt_tokens": self.last_estimated_prompt_tokens,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+        }
+
+prompt_stats = PromptStats()
+
+def prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode()).hexdigest()
+
+async def _complete(prompt: str) -> str:
+    prompt_stats.record_prompt(prompt)
+    async with _llm_slots:
+        with metrics.LLM_ERRORS.labels("complete").count_exceptions(), metrics.LLM_LATENCY.labels("complete").time():
+            response = await async_client.chat.completions.create(**completion_params(prompt))
+    prompt_stats.record_usage(getattr(response, "usage", None))
+    metrics.record_llm_usage(getattr(response, "usage", None))
+    return response.choices[0].message.content.strip()
+
+async def complete(prompt: str) -> str:
+    """
+    Runs a completion, sharing it with any identical prompt already in flight.
+
+    Concurrent callers with the same prompt await one request to the model;
+    errors are raised to every one of them.
+    """
+    key = prompt_hash(prompt)
+    task = _in_flight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_complete(prompt))
+        _in_flight[key] = task
+        task.add_done_callback(lambda _: _in_flight.pop(key, None))
+    # A caller that disconnects must not cancel the completion for the others
+    return await asyncio.shield(task)
+
+async def stream_completion(prompt: str) -> AsyncIterator[Tuple[str, Optional[dict]]]:
+    """
+    Streams a completion as (delta, usage) pairs.
+
+    usage is None on every pair except the last, which carries the token
+    counts reported by the model and an empty delta.
+    """
+    prompt_stats.record_prompt(prompt)
+    async with _llm_slots:
+        with metrics.LLM_ERRORS.labels("stream").count_exceptions(), metrics.LLM_LATENCY.labels("stream").time():
+            stream = await async_client.chat.completions.create(
+                **completion_params(prompt), stream=True, stream_options={"include_usage": True}
+            )
+            usage = None
+            async for chunk in stream:
+                if chunk.usage is not None:
+                    prompt_stats.record_usage(chunk.usage)
+                    metrics.record_llm_usage(chunk.usage)
+                    usage = {
+                        "prompt_tokens": chunk.usage.prompt_tokens,
+                        "completion_tokens": chunk.usage.completion_tokens,
+                        "total_tokens": chunk.usage.total_tokens,
+                    }
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content, None
+    yield "", usage
+
+async def stream_summary(
+    make_prompt: Callable[[], Awaitable[str]], first_token_timeout: Optional[float] = None
+) -> AsyncIterator[Tuple[str, Optional[dict]]]:
+    """
+    Prepares the prompt and streams its completion like stream_completion.
+
+    Raises asyncio.TimeoutError when the first token hasn't arrived within
+    first_token_timeout (LLM_SUMMARY_TIMEOUT by default) of the call,
+    prompt preparation included.
+    """
+    loop = asyncio.get_running_loop()
+    timeout = LLM_SUMMARY_TIMEOUT if first_token_timeout is None else first_token_timeout
+    deadline = loop.time() + timeout
+    prompt = await asyncio.wait_for(make_prompt(), timeout)
+    stream = stream_completion(prompt)
+    try:
+        item = await asyncio.wait_for(stream.__anext__(), max(deadline - loop.time(), 0))
+        yield item
+        # Later tokens are bounded by the client's read timeout
+        async for item in stream:
+            yield item
+    except StopAsyncIteration:
+        return
+    finally:
+        await stream.aclose()
+
+def _keep_partial(key: str, task: asyncio.Future):
+    if not task.cancelled() and task.exception() is None:
+        summary_cache.partials.set(key, task.result())
+
+async def _map(prompts: List[str]) -> List[str]:
+    slots = asyncio.Semaphore(SUMMARY_MAP_CONCURRENCY)
+
+    async def run(prompt: str) -> str:
+        key = prompt_hash(prompt)
+        partial = summary_cache.partials.get(key)
+        if partial is not None:
+            return partial
+        async with slots:
+            task = asyncio.ensure_future(complete(prompt))
+            # Kept even when the caller times out, so the next one resumes here
+            task.add_done_callback(lambda t: _keep_partial(key, t))
+            return await asyncio.shield(task)
+
+    return list(await asyncio.gather(*[run(p) for p in prompts]))
+
+async def prepare_prompt(todos: List[models.Todo]) -> str:
+    """
+    Returns the prompt whose completion is the summary.
+
+    Small lists get the single prompt from build_prompt. For lists over
+    SUMMARY_TOKEN_BUDGET the map step runs here, and partial summaries are
+    reduced level by level until they fit into one final reduce prompt.
+    """
+    prompt = build_prompt(todos)
+    if estimate_tokens(prompt) <= SUMMARY_TOKEN_BUDGET:
+        return prompt
+
+    chunks = chunk_by_tokens(todos, todo_line, SUMMARY_CHUNK_TOKENS)
+    partials = await _map([build_map_prompt(chunk) for chunk in chunks])
+    while len(partials) > 1 and estimate_tokens(build_reduce_prompt(partials)) > SUMMARY_TOKEN_BUDGET:
+        groups = chunk_by_tokens(partials, lambda p: p, SUMMARY_CHUNK_TOKENS)
+        if len(groups) == len(partials):
+            # Every partial needs a group of its own, another level won't shrink them
+            break
+        partials = await _map([build_reduce_prompt(group) for group in groups])
+    return build_reduce_prompt(partials)
+
+async def summarize(make_prompt: Callable[[], Awaitable[str]], bounded: bool = True) -> Optional[str]:
+    """
+    Prepares the prompt and completes it. Returns None, for the caller to
+    fall back, on any failure or, when bounded, when both together take
+    longer than LLM_SUMMARY_TIMEOUT. Background callers pass bounded=False:
+    nobody waits on them, and a long map phase must be allowed to finish.
+    """
+    async def run() -> str:
+        # Preparing the prompt may itself call the model (map-reduce)
+        return await complete(await make_prompt())
+
+    try:
+        return await asyncio.wait_for(run(), LLM_SUMMARY_TIMEOUT if bounded else None)
+    except Exception:
+        logger.warning("Summarizing with the model failed", exc_info=True)
+        return None
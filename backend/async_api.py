@@ -0,0 +1,116 @@
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+# from . import models, schemas, pagination, queries, database
+import models
+import schemas
+import pagination
+import queries
+import serialization
+import database
+import summary_cache
+import summary_worker
+import events
+import versioning
+
+# Async counterparts of the CRUD endpoints in main.py, mounted when DB_MODE=async.
+# Item routes use the int converter so /todos/summary and /todos/export still
+# reach the sync handlers registered after this router.
+router = APIRouter()
+
+# Dependency
+async def get_db():
+    async with database.AsyncSessionLocal() as db:
+        yield db
+
+async def _get_or_404(db: AsyncSession, todo_id: int) -> models.Todo:
+    db_todo = await db.get(models.Todo, todo_id)
+    if db_todo is None:
+        raise HTTPException(status_code=404, detail="Todo not found")
+    return db_todo
+
+async def _commit(db: AsyncSession):
+    await db.commit()
+    summary_cache.cache.invalidate()
+    summary_worker.notify_write()
+    events.notify_write()
+
+@router.post("/todos/", response_model=schemas.Todo)
+async def create_todo(todo: schemas.TodoCreate, db: AsyncSession = Depends(get_db)):
+    db_todo = models.Todo(**todo.model_dump())
+    db.add(db_todo)
+    await _commit(db)
+    await db.refresh(db_todo)
+    return db_todo
+
+@router.get("/todos/", response_model=List[schemas.Todo])
+async def get_todos(
+    request: Request,
+    response: Response,
+    limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    completed: Optional[bool] = None,
+    due_before: Optional[datetime] = None,
+    due_after: Optional[datetime] = None,
+    sort: str = Query("id", pattern="^(id|due_date|created_at)$"),
+    fields: Optional[str] = Query(None, pattern=serialization.FIELDS_PATTERN),
+    db: AsyncSession = Depends(get_db),
+):
+    version = await db.run_sync(versioning.current)
+    not_modified = versioning.conditional(request, response, version, request.url.path, request.url.query)
+    if not_modified is not None:
+        return not_modified
+
+    filters = queries.todo_filters(completed, due_before, due_after)
+    fields = serialization.parse_fields(fields)
+    try:
+        stmt = queries.list_todos_statement(limit, cursor, sort, filters, serialization.projection(fields).columns)
+    except pagination.InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    rows = (await db.execute(stmt)).all()
+    next_page = queries.next_cursor(rows, limit, sort)
+    if next_page is not None:
+        response.headers["X-Next-Cursor"] = next_page
+    # Serialized straight from the rows; returning a Response skips
+    # response_model validation, which stays only for the OpenAPI schema
+    return Response(serialization.todos_json(rows[:limit], fields), media_type="application/json", headers=response.headers)
+
+@router.get("/todos/{todo_id:int}", response_model=schemas.Todo)
+async def get_todo(todo_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    version = await db.run_sync(versioning.current)
+    not_modified = versioning.conditional(request, response, version, request.url.path)
+    if not_modified is not None:
+        return not_modified
+    return await _get_or_404(db, todo_id)
+
+@router.put("/todos/{todo_id:int}", response_model=schemas.Todo)
+async def update_todo(todo_id: int, todo: schemas.TodoCreate, db: AsyncSession = Depends(get_db)):
+    db_todo = await _get_or_404(db, todo_id)
+
+    for key, value in todo.model_dump().items():
+        setattr(db_todo, key, value)
+
+    await _commit(db)
+    await db.refresh(db_todo)
+    return db_todo
+
+@router.patch("/todos/{todo_id:int}", response_model=schemas.Todo)
+async def patch_todo(todo_id: int, changes: schemas.TodoUpdate, db: AsyncSession = Depends(get_db)):
+    values = changes.model_dump(exclude_unset=True)
+    row = (await db.execute(queries.patch_todo_statement(todo_id, values))).first()
+    if values and row is not None:
+        await _commit(db)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Todo not found")
+    return schemas.Todo.model_validate(row)
+
+@router.delete("/todos/{todo_id:int}", response_model=schemas.Todo)
+async def delete_todo(todo_id: int, db: AsyncSession = Depends(get_db)):
+    row = (await db.execute(queries.delete_todo_statement(todo_id))).first()
+    if row is not None:
+        await _commit(db)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Todo not found")
+    return schemas.Todo.model_validate(row)
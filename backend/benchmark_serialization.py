@@ -0,0 +1,85 @@
+"""
+Compares the two ways of turning a page of todos into JSON:
+
+  orm   - select ORM instances, validate them into List[schemas.Todo] with
+          from_attributes and dump them, as response_model does
+  rows  - select Core rows and dump them with serialization.todos_json
+
+Run from backend/:  python benchmark_serialization.py [rows ...]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import List
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+import models
+import schemas
+import serialization
+
+REPEAT = 3
+
+
+def seed(engine, count: int):
+    models.Base.metadata.create_all(bind=engine)
+    start = datetime(2025, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(models.Todo), [
+            {
+                "title": f"Todo {i}",
+                "description": f"Description of todo {i}",
+                "completed": i % 3 == 0,
+                "due_date": start + timedelta(hours=i) if i % 5 else None,
+            }
+            for i in range(count)
+        ])
+
+
+def orm_path(engine) -> bytes:
+    adapter = TypeAdapter(List[schemas.Todo])
+    with Session(engine) as db:
+        todos = db.scalars(select(models.Todo).order_by(models.Todo.id)).all()
+        validated = adapter.validate_python(todos, from_attributes=True)
+        content = adapter.dump_python(validated, mode="json")
+    # What JSONResponse.render does with it
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def rows_path(engine) -> bytes:
+    with Session(engine) as db:
+        rows = db.execute(select(*models.Todo.__table__.c).order_by(models.Todo.id)).all()
+        return serialization.todos_json(rows)
+
+
+def best_of(fn, engine) -> float:
+    timings = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        fn(engine)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main(sizes: List[int]):
+    print(f"{'rows':>8} {'orm rows/s':>12} {'rows rows/s':>12} {'speedup':>8}")
+    for count in sizes:
+        fd, path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        engine = create_engine(f"sqlite:///{path}")
+        try:
+            seed(engine, count)
+            assert json.loads(orm_path(engine)) == json.loads(rows_path(engine))
+            orm = best_of(orm_path, engine)
+            rows = best_of(rows_path, engine)
+            print(f"{count:>8} {count / orm:>12,.0f} {count / rows:>12,.0f} {orm / rows:>7.1f}x")
+        finally:
+            engine.dispose()
+            os.unlink(path)
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000])
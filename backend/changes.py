@@ -0,0 +1,157 @@
+import os
+import time
+from typing import List, NamedTuple, Set, Tuple
+from sqlalchemy import Boolean, Integer, event, text
+# from . import models
+import models
+
+# Changes older than this many seconds may be compacted away; clients whose
+# cursor predates the compacted range must resync from GET /todos/
+CHANGES_RETENTION = float(os.getenv("CHANGES_RETENTION", str(7 * 24 * 3600)))
+# How often the app compacts the changelog, in seconds
+CHANGES_COMPACT_INTERVAL = float(os.getenv("CHANGES_COMPACT_INTERVAL", "3600"))
+
+_NOW = "((julianday('now') - 2440587.5) * 86400.0)"
+
+# Changelog of todos, one entry per written row with a monotonic seq. The
+# triggers run inside the writing statement's transaction, so an entry
+# exists exactly when its write was committed, whichever code path wrote.
+# todos_changes_state holds the compaction horizon: every entry with
+# seq <= horizon may have been dropped.
+CHANGES_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS todos_changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        todo_id INTEGER NOT NULL,
+        op TEXT NOT NULL,
+        changed_at REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_todos_changes_todo_id ON todos_changes (todo_id, seq)",
+    """
+    CREATE TABLE IF NOT EXISTS todos_changes_state (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        horizon INTEGER NOT NULL
+    )
+    """,
+    "INSERT OR IGNORE INTO todos_changes_state (id, horizon) VALUES (1, 0)",
+] + [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS todos_changes_{op} AFTER {op.upper()} ON todos BEGIN
+        INSERT INTO todos_changes (todo_id, op, changed_at) VALUES ({row}.id, '{op}', {_NOW});
+    END
+    """
+    for op, row in (("insert", "new"), ("update", "new"), ("delete", "old"))
+]
+
+# The latest entry of each todo changed after :since, with the todo's
+# current row, or NULLs for a deleted one. Older entries of the same todo
+# are superseded: the client only needs the current state.
+CHANGES_SQL = text("""
+    SELECT c.seq AS seq, c.todo_id AS todo_id, t.id IS NULL AS deleted, t.*
+    FROM todos_changes c LEFT JOIN todos t ON t.id = c.todo_id
+    WHERE c.seq > :since
+      AND c.seq = (SELECT max(seq) FROM todos_changes WHERE todo_id = c.todo_id)
+    ORDER BY c.seq
+    LIMIT :limit
+""").columns(*models.Todo.__table__.c, seq=Integer, todo_id=Integer, deleted=Boolean)
+
+
+class ResyncRequired(Exception):
+    """Raised when entries after a client's cursor were compacted away."""
+
+    def __init__(self, head: int):
+        super().__init__(head)
+        self.head = head
+
+
+class Page(NamedTuple):
+    rows: List
+    next_since: int
+    has_more: bool
+
+
+def install(connection):
+    """
+    Creates the changelog and its triggers if missing. A new changelog is
+    seeded with an entry per existing todo, so since=0 is a full sync.
+    """
+    exists = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE name = 'todos_changes'"
+    ).first()
+    for ddl in CHANGES_DDL:
+        connection.exec_driver_sql(ddl)
+    if not exists:
+        connection.exec_driver_sql(
+            f"INSERT INTO todos_changes (todo_id, op, changed_at) SELECT id, 'insert', {_NOW} FROM todos ORDER BY id"
+        )
+
+
+@event.listens_for(models.Todo.__table__, "after_create")
+def _install_after_create(target, connection, **kw):
+    install(connection)
+
+
+def head(db) -> int:
+    """
+    Returns the newest seq, the since= to continue from after a full reload.
+    """
+    # Never behind the horizon, even once every entry was compacted away
+    return db.execute(text(
+        "SELECT max(coalesce((SELECT max(seq) FROM todos_changes), 0), horizon) FROM todos_changes_state"
+    )).scalar_one()
+
+
+def changes_since(db, since: int, limit: int) -> Page:
+    """
+    Returns up to limit changes after since, oldest first.
+
+    Raises ResyncRequired when since is older than the compaction horizon.
+    """
+    horizon = db.execute(text("SELECT horizon FROM todos_changes_state WHERE id = 1")).scalar_one()
+    if since < horizon:
+        raise ResyncRequired(head(db))
+    rows = db.execute(CHANGES_SQL, {"since": since, "limit": limit + 1}).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return Page(rows, rows[-1].seq if rows else since, has_more)
+
+
+def changed_ids(db, since: int) -> Tuple[Set[int], int]:
+    """
+    Returns the ids of todos written after since and the seq to continue
+    from. Raises ResyncRequired when since is older than the compaction horizon.
+    """
+    horizon = db.execute(text("SELECT horizon FROM todos_changes_state WHERE id = 1")).scalar_one()
+    if since < horizon:
+        raise ResyncRequired(head(db))
+    rows = db.execute(
+        text("SELECT todo_id, seq FROM todos_changes WHERE seq > :since ORDER BY seq"), {"since": since}
+    ).all()
+    return {row.todo_id for row in rows}, rows[-1].seq if rows else since
+
+
+def compact(db, retention: float = CHANGES_RETENTION) -> int:
+    """
+    Compacts the changelog and returns the number of entries removed.
+
+    Entries superseded by a later one for the same todo are never served and
+    go first, which costs no client anything. Then every entry older than
+    retention seconds goes and the horizon moves past it.
+    """
+    superseded = db.execute(text("""
+        DELETE FROM todos_changes
+        WHERE seq < (SELECT max(seq) FROM todos_changes AS later WHERE later.todo_id = todos_changes.todo_id)
+    """)).rowcount
+    cutoff = time.time() - retention
+    horizon = db.execute(
+        text("SELECT max(seq) FROM todos_changes WHERE changed_at < :cutoff"), {"cutoff": cutoff}
+    ).scalar_one()
+    expired = 0
+    if horizon is not None:
+        expired = db.execute(text("DELETE FROM todos_changes WHERE seq <= :horizon"), {"horizon": horizon}).rowcount
+        db.execute(
+            text("UPDATE todos_changes_state SET horizon = max(horizon, :horizon) WHERE id = 1"),
+            {"horizon": horizon},
+        )
+    return superseded + expired
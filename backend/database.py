@@ -1,11 +1,187 @@
-from sqlalchemy import create_engine
+import contextvars
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from typing import Callable, List, Optional
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+# The app connects (and creates its tables) as soon as main is imported, so
+# tests point this at a scratch file instead of the checked-in database
+SQLITE_DATABASE_PATH = os.getenv("SQLITE_DATABASE_PATH", "./test.db")
+SQLALCHEMY_DATABASE_URL = f"sqlite:///{SQLITE_DATABASE_PATH}"
+SQLALCHEMY_ASYNC_DATABASE_URL = f"sqlite+aiosqlite:///{SQLITE_DATABASE_PATH}"
+
+# "sync" serves requests from the threadpool with SessionLocal,
+# "async" serves the CRUD endpoints on the event loop with AsyncSessionLocal
+DB_MODE = os.getenv("DB_MODE", "sync")
+
+# When enabled, writes from the sync handlers are funnelled through one
+# dedicated writer connection (see writer.py) and requests read through a
+# separate pool of read-only connections
+SQLITE_SINGLE_WRITER = os.getenv("SQLITE_SINGLE_WRITER", "false").lower() in ("1", "true", "yes")
+
+# Applied to every new SQLite connection. WAL lets readers run alongside the
+# writer, and busy_timeout makes a writer wait for the lock instead of failing
+# straight away with "database is locked".
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    # Negative values are KiB rather than pages
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),
+    "temp_store": os.getenv("SQLITE_TEMP_STORE", "MEMORY"),
+}
+
+def set_sqlite_pragmas(dbapi_connection, connection_record=None):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+def set_query_only(dbapi_connection, connection_record=None):
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA query_only=ON")
+    finally:
+        cursor.close()
+
+# Statements slower than this many milliseconds are logged with their query
+# plan (0 disables)
+QUERY_SLOW_MS = float(os.getenv("QUERY_SLOW_MS", "100"))
+# Requests running more statements than this are logged as over budget,
+# which is how N+1 query patterns show up (0 disables)
+QUERY_BUDGET = int(os.getenv("QUERY_BUDGET", "20"))
+# Adds X-DB-Queries, X-DB-Time (ms) and, over budget, X-DB-Over-Budget to
+# every response
+QUERY_DEBUG_HEADERS = os.getenv("QUERY_DEBUG_HEADERS", "false").lower() in ("1", "true", "yes")
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+def fingerprint(statement: str) -> str:
+    """
+    Normalizes a statement so that runs differing only in literal values or
+    IN-list length compare equal.
+    """
+    statement = _LITERALS.sub("?", _WHITESPACE.sub(" ", statement).strip())
+    return _IN_LISTS.sub("(?)", statement)
+
+class QueryStats:
+    """
+    Statements run on behalf of one request: how many, the time spent in
+    them and how often each fingerprint ran.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+        # Sync handlers and run_in_threadpool calls share the stats object
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, duration: float):
+        key = fingerprint(statement)
+        with self._lock:
+            self.count += 1
+            self.duration += duration
+            self.fingerprints[key] += 1
+
+    def over_budget(self) -> bool:
+        return QUERY_BUDGET > 0 and self.count > QUERY_BUDGET
+
+    def headers(self) -> dict:
+        headers = {"X-DB-Queries": str(self.count), "X-DB-Time": f"{self.duration * 1000:.2f}"}
+        if self.over_budget():
+            headers["X-DB-Over-Budget"] = "true"
+        return headers
+
+# Set for the duration of a request; the thread pool and the async engine's
+# greenlets inherit it, so statements from either are attributed
+query_stats: contextvars.ContextVar[Optional[QueryStats]] = contextvars.ContextVar("query_stats", default=None)
+
+def explain(dbapi_connection, statement: str, parameters) -> str:
+    """
+    Returns the EXPLAIN QUERY PLAN of a statement, one step per line.
+    """
+    if isinstance(parameters, list):
+        # executemany: every parameter set shares one plan
+        parameters = parameters[0] if parameters else ()
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        return "\n".join(row[-1] for row in cursor.fetchall())
+    finally:
+        cursor.close()
+
+# Called with (statement, seconds) after every statement and with
+# (statement, None) when one raised; metrics feeds its histograms from here
+statement_hooks: List[Callable[[str, Optional[float]], None]] = []
+
+# Every statement is timed once, here, on every engine
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info["query_started"].pop()
+    for hook in statement_hooks:
+        hook(statement, duration)
+    stats = query_stats.get()
+    if stats is not None:
+        stats.record(statement, duration)
+    if QUERY_SLOW_MS > 0 and duration * 1000 >= QUERY_SLOW_MS:
+        try:
+            plan = explain(conn.connection, statement, parameters)
+        except Exception as e:
+            plan = f"unavailable ({e})"
+        logger.warning("Slow query (%.1f ms): %s\nQuery plan:\n%s", duration * 1000, statement, plan)
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    if context.connection is not None and context.connection.info.get("query_started"):
+        context.connection.info["query_started"].pop()
+    for hook in statement_hooks:
+        hook(context.statement or "", None)
+
+def sqlite_settings(bind) -> dict:
+    """
+    Reads back the effective value of every configured pragma.
+    """
+    with bind.connect() as conn:
+        return {name: conn.exec_driver_sql(f"PRAGMA {name}").scalar() for name in SQLITE_PRAGMAS}
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
+event.listen(engine, "connect", set_sqlite_pragmas)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+read_engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+event.listen(read_engine, "connect", set_sqlite_pragmas)
+event.listen(read_engine, "connect", set_query_only)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+async_engine = None
+AsyncSessionLocal = None
+if DB_MODE == "async":
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+    async_engine = create_async_engine(SQLALCHEMY_ASYNC_DATABASE_URL)
+    event.listen(async_engine.sync_engine, "connect", set_sqlite_pragmas)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
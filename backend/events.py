@@ -0,0 +1,197 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Awaitable, Callable, List, Optional, Set, Tuple
+# from . import changes
+import changes
+
+logger = logging.getLogger(__name__)
+
+# Batches a subscriber may have queued before it counts as too slow and is
+# disconnected; it can reconnect and catch up from the changelog
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "64"))
+# Writes landing within this many seconds of each other go out as one event
+EVENTS_BATCH_WINDOW = float(os.getenv("EVENTS_BATCH_WINDOW", "0.05"))
+# Seconds between keep-alive comments on an idle stream
+EVENTS_HEARTBEAT = float(os.getenv("EVENTS_HEARTBEAT", "15"))
+# While anyone is subscribed, check the changelog this often for writes made
+# by other worker processes (0 disables)
+EVENTS_POLL_INTERVAL = float(os.getenv("EVENTS_POLL_INTERVAL", "1"))
+
+_DROPPED = object()
+
+# fetch(since) returns the changes after since as JSON-ready dicts and the
+# seq to continue from; fetch(None) returns no changes and the current head
+Fetch = Callable[[Optional[int]], Awaitable[Tuple[List[dict], int]]]
+
+
+def sse(event: str, data, id: Optional[int] = None) -> str:
+    """
+    Formats one Server-Sent Event; used by every event stream the app serves.
+    """
+    head = f"id: {id}\n" if id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class Subscriber:
+    __slots__ = ("queue",)
+
+    def __init__(self, queue_size: int):
+        self.queue = asyncio.Queue(queue_size)
+
+
+class Broadcaster:
+    """
+    Fans todo changes out to Server-Sent Events subscribers.
+
+    Writes only call notify, from any thread. The broadcaster reads what
+    changed from the changelog once per batch window, formats one event and
+    hands the same string to every subscriber's bounded queue. A subscriber
+    whose queue is full is dropped instead of slowing the others down. An
+    idle subscriber costs one queue and one pending get.
+    """
+
+    def __init__(
+        self,
+        fetch: Fetch,
+        batch_window: float = EVENTS_BATCH_WINDOW,
+        queue_size: int = EVENTS_QUEUE_SIZE,
+        poll_interval: float = EVENTS_POLL_INTERVAL,
+    ):
+        self.fetch = fetch
+        self.batch_window = batch_window
+        self.queue_size = queue_size
+        self.poll_interval = poll_interval
+        self.published = 0
+        self.dropped = 0
+        self._subscribers: Set[Subscriber] = set()
+        self._seq = None
+        self._loop = None
+        self._pending = None
+        self._flushing = False
+        self._poller = None
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        _, self._seq = await self.fetch(None)
+        if self.poll_interval > 0:
+            self._poller = asyncio.create_task(self._poll())
+
+    async def stop(self):
+        if self._pending is not None:
+            self._pending.cancel()
+        if self._poller is not None:
+            self._poller.cancel()
+        for subscriber in list(self._subscribers):
+            self._drop(subscriber)
+        self._loop = None
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> Subscriber:
+        subscriber = Subscriber(self.queue_size)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+
+    def notify(self):
+        """
+        Signals that todos changed; safe to call from any thread.
+        """
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._schedule)
+
+    def _schedule(self):
+        # The first write opens the window, later ones ride along
+        if self._pending is None and self._loop is not None:
+            self._pending = self._loop.call_later(self.batch_window, self._spawn_flush)
+
+    def _spawn_flush(self):
+        self._pending = None
+        if self._flushing:
+            # Writes made during a flush get their own window afterwards
+            self._schedule()
+            return
+        self._loop.create_task(self.flush())
+
+    async def flush(self):
+        self._flushing = True
+        try:
+            if not self._subscribers:
+                # Nobody to tell, just keep up with the head
+                _, self._seq = await self.fetch(None)
+                return
+            batch, self._seq = await self.fetch(self._seq)
+            if batch:
+                self.publish(sse("changes", {"changes": batch, "next_since": self._seq}, id=self._seq))
+        except Exception:
+            logger.exception("Reading todo changes for subscribers failed")
+        finally:
+            self._flushing = False
+
+    def publish(self, message: str):
+        self.published += 1
+        for subscriber in list(self._subscribers):
+            try:
+                subscriber.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self._drop(subscriber)
+
+    def _drop(self, subscriber: Subscriber):
+        self.unsubscribe(subscriber)
+        self.dropped += 1
+        # Skip whatever is still queued, the client resumes from the changelog
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(_DROPPED)
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            if self._subscribers and self._pending is None and not self._flushing:
+                await self.flush()
+
+    async def stream(self, subscriber: Subscriber, last_event_id: Optional[int] = None, heartbeat: float = EVENTS_HEARTBEAT):
+        """
+        Yields the SSE text for one subscriber until it disconnects or is
+        dropped. With last_event_id (EventSource sends it on reconnect) the
+        changes missed since then are replayed first.
+        """
+        try:
+            if last_event_id is not None:
+                try:
+                    batch, seq = await self.fetch(last_event_id)
+                except changes.ResyncRequired as e:
+                    yield sse("resync", {"head": e.head}, id=e.head)
+                else:
+                    if batch:
+                        yield sse("changes", {"changes": batch, "next_since": seq}, id=seq)
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscriber.queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if message is _DROPPED:
+                    yield sse("dropped", {})
+                    return
+                yield message
+        finally:
+            self.unsubscribe(subscriber)
+
+
+# Set while the broadcaster is running
+broadcaster: Optional[Broadcaster] = None
+
+
+def notify_write():
+    """
+    Tells the broadcaster that todos changed; a no-op when it isn't running.
+    """
+    if broadcaster is not None:
+        broadcaster.notify()
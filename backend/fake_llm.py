@@ -0,0 +1,73 @@
+import asyncio
+import re
+from types import SimpleNamespace
+from typing import Optional
+
+# A stand-in for AsyncOpenAI that answers locally, for tests and for load
+# testing without an API key (LLM_BACKEND=fake). Only the parts of
+# chat.completions.create the app uses are implemented.
+
+
+def _usage(prompt: str, reply_tokens: int):
+    prompt_tokens = max(1, len(prompt) // 4)
+    return SimpleNamespace(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=reply_tokens,
+        total_tokens=prompt_tokens + reply_tokens,
+    )
+
+
+class _FakeStream:
+    def __init__(self, tokens, usage, delay: float, include_usage: bool):
+        self._tokens = tokens
+        self._usage = usage
+        self._delay = delay
+        self._include_usage = include_usage
+
+    async def __aiter__(self):
+        for token in self._tokens:
+            if self._delay:
+                await asyncio.sleep(self._delay)
+            delta = SimpleNamespace(content=token, role="assistant")
+            yield SimpleNamespace(choices=[SimpleNamespace(index=0, delta=delta, finish_reason=None)], usage=None)
+        if self._include_usage:
+            yield SimpleNamespace(choices=[], usage=self._usage)
+
+
+class _FakeCompletions:
+    def __init__(self, model: "FakeAsyncOpenAI"):
+        self._model = model
+
+    async def create(self, messages, stream: bool = False, stream_options: Optional[dict] = None, **kwargs):
+        self._model.calls += 1
+        prompt = messages[-1]["content"]
+        reply = self._model.reply_for(prompt)
+        tokens = re.findall(r"\S+\s*", reply)
+        usage = _usage(prompt, len(tokens))
+        if stream:
+            include_usage = bool(stream_options and stream_options.get("include_usage"))
+            return _FakeStream(tokens, usage, self._model.delay, include_usage)
+        if self._model.delay:
+            await asyncio.sleep(self._model.delay * len(tokens))
+        message = SimpleNamespace(content=reply, role="assistant")
+        return SimpleNamespace(choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")], usage=usage)
+
+
+class FakeAsyncOpenAI:
+    """
+    Deterministic local chat model. Replies with `reply` when given, otherwise
+    with a sentence counting the "- " task lines in the prompt, streamed one
+    word at a time with `delay` seconds between words.
+    """
+
+    def __init__(self, reply: Optional[str] = None, delay: float = 0.0):
+        self.reply = reply
+        self.delay = delay
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=_FakeCompletions(self))
+
+    def reply_for(self, prompt: str) -> str:
+        if self.reply is not None:
+            return self.reply
+        count = sum(1 for line in prompt.splitlines() if line.startswith("- "))
+        return f"You have {count} tasks on your list. Keep up the good work!"
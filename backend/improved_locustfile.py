@@ -7,11 +7,11 @@ class TodoUser(HttpUser):
     created_todos = []
 
     def on_start(self):
-        # Seed a few todos
-        for i in range(3):
-            res = self.client.post("/todos/", json={"title": f"Seed {i}", "description": f"Desc {i}"})
-            if res.status_code == 200:
-                self.created_todos.append(res.json())
+        # Seed a few todos in one request
+        seed = [{"title": f"Seed {i}", "description": f"Desc {i}"} for i in range(3)]
+        res = self.client.post("/todos/bulk?echo=true", json=seed)
+        if res.status_code == 200:
+            self.created_todos.extend(res.json()["todos"])
 
     @task(4)
     def list_todos(self):
@@ -0,0 +1,113 @@
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from sqlalchemy import case, false, func, select, true
+from sqlalchemy.orm import Session
+# from . import models
+import models
+import ai_summary
+
+
+class Bucket(NamedTuple):
+    count: int
+    # Earliest due date in the bucket and the title of that todo
+    next_due: Optional[datetime]
+    next_title: Optional[str]
+
+
+def _plural(count: int, word: str) -> str:
+    return f"{count} {word}" if count == 1 else f"{count} {word}s"
+
+
+def bucket_counts(db: Session, today: date) -> Dict[str, Bucket]:
+    """
+    Counts todos per summary bucket with one GROUP BY over todos.
+
+    Buckets are completed, undated, overdue, today and upcoming. Each also
+    reports its earliest due date and that todo's title; SQLite takes bare
+    columns from the row that produced min().
+    """
+    start = datetime.combine(today, time.min)
+    end = start + timedelta(days=1)
+    bucket = case(
+        (models.Todo.completed == true(), "completed"),
+        (models.Todo.due_date.is_(None), "undated"),
+        (models.Todo.due_date < start, "overdue"),
+        (models.Todo.due_date < end, "today"),
+        else_="upcoming",
+    ).label("bucket")
+    stmt = select(
+        bucket, func.count(), func.min(models.Todo.due_date), models.Todo.title
+    ).group_by(bucket)
+    return {name: Bucket(count, next_due, title) for name, count, next_due, title in db.execute(stmt)}
+
+
+class PromptContext(NamedTuple):
+    buckets: Dict[str, Bucket]
+    # (title, due_date) of the pending todos most worth naming, by due date
+    overdue: List[Tuple[str, datetime]]
+    upcoming: List[Tuple[str, datetime]]
+
+
+def prompt_context(db: Session, today: date, top_n: int) -> PromptContext:
+    """
+    Collects what the compact AI prompt needs: the bucket counts plus the
+    top_n oldest overdue and top_n soonest upcoming titles (due today
+    included). Both lists are range scans on ix_todos_completed_due_date.
+    """
+    start = datetime.combine(today, time.min)
+    pending = select(models.Todo.title, models.Todo.due_date).where(
+        models.Todo.completed == false(), models.Todo.due_date.is_not(None)
+    ).order_by(models.Todo.due_date).limit(top_n)
+    overdue = db.execute(pending.where(models.Todo.due_date < start)).all()
+    upcoming = db.execute(pending.where(models.Todo.due_date >= start)).all()
+    return PromptContext(
+        bucket_counts(db, today),
+        [tuple(row) for row in overdue],
+        [tuple(row) for row in upcoming],
+    )
+
+
+def render_summary(buckets: Dict[str, Bucket]) -> str:
+    """
+    Renders bucket counts as a short summary in the same order the AI summary
+    uses: overdue first, then due today, then upcoming.
+    """
+    if not buckets:
+        return ai_summary.NO_TODOS_MESSAGE
+
+    sentences = []
+    overdue = buckets.get("overdue")
+    if overdue:
+        sentences.append(
+            f"You have {_plural(overdue.count, 'overdue task')}, the oldest is \"{overdue.next_title}\"."
+        )
+    today = buckets.get("today")
+    if today:
+        verb = "is" if today.count == 1 else "are"
+        sentences.append(f"{_plural(today.count, 'task')} {verb} due today, starting with \"{today.next_title}\".")
+    upcoming = buckets.get("upcoming")
+    if upcoming:
+        sentences.append(
+            f"{_plural(upcoming.count, 'upcoming task')} ahead, next up is \"{upcoming.next_title}\" "
+            f"on {upcoming.next_due.strftime('%Y-%m-%d')}."
+        )
+    undated = buckets.get("undated")
+    if undated:
+        verb = "has" if undated.count == 1 else "have"
+        sentences.append(f"{_plural(undated.count, 'task')} {verb} no due date.")
+
+    completed = buckets.get("completed")
+    if not sentences:
+        if completed.count == 1:
+            return "Your only task is completed. Enjoy your day!"
+        return f"All {completed.count} tasks are completed. Enjoy your day!"
+    if completed:
+        sentences.append(f"You've already completed {_plural(completed.count, 'task')}, keep it up!")
+    return " ".join(sentences)
+
+
+def generate_local_summary(db: Session, today: date) -> str:
+    """
+    Summarizes the todos without a model; answers in milliseconds at any table size.
+    """
+    return render_summary(bucket_counts(db, today))
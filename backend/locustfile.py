@@ -8,12 +8,11 @@ class TodoUser(HttpUser):
 
     def on_start(self):
         """ on_start is called when a Locust start before any task is scheduled """
-        # Let's create some initial todos
-        for i in range(5):
-            title = f"Initial Todo {i}"
-            res = self.client.post("/todos/", json={"title": title, "description": f"Description for {title}"})
-            if res.status_code == 200:
-                self.created_todos.append(res.json())
+        # Let's create some initial todos in one request
+        initial = [{"title": f"Initial Todo {i}", "description": f"Description for Initial Todo {i}"} for i in range(5)]
+        res = self.client.post("/todos/bulk?echo=true", json=initial)
+        if res.status_code == 200:
+            self.created_todos.extend(res.json()["todos"])
 
     @task(5) # Higher weight for getting all todos
     def get_todos(self):
@@ -1,18 +1,82 @@
-from fastapi import FastAPI, HTTPException, Depends
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List
+from fastapi.responses import StreamingResponse
+from typing import List, Optional, Tuple
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import delete, insert, select, update
 from sqlalchemy.orm import Session
 # from . import models, schemas, ai_summary
 # from .database import SessionLocal, engine
 import models
 import schemas
 import ai_summary
-from database import SessionLocal, engine
+import pagination
+import queries
+import serialization
+import search
+import summary_cache
+import row_cache
+import summary_worker
+import versioning
+import changes
+import events
+import local_summary
+import metrics
+import async_api
+import database
+import writer
+from database import SessionLocal, engine, DB_MODE
 from datetime import date, datetime
 
 models.Base.metadata.create_all(bind=engine)
 
-app = FastAPI()
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+logger = logging.getLogger(__name__)
+
+# Set while the single-writer queue is running (SQLITE_SINGLE_WRITER=true)
+write_queue = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global write_queue
+    logger.info("SQLite settings (%s mode): %s", DB_MODE, database.sqlite_settings(engine))
+    models.upgrade_indexes(engine)
+    with engine.begin() as conn:
+        search.install(conn)
+        versioning.install(conn)
+        changes.install(conn)
+    if database.SQLITE_SINGLE_WRITER:
+        write_queue = writer.WriteQueue(engine)
+        write_queue.start()
+        logger.info("Single-writer queue started")
+    if summary_worker.SUMMARY_PRECOMPUTE and ai_summary.SUMMARY_BACKEND == "llm":
+        summary_worker.refresher = summary_worker.SummaryRefresher(_refresh_summary)
+        summary_worker.refresher.start(asyncio.get_running_loop())
+    compaction = asyncio.create_task(_compact_changes_periodically())
+    events.broadcaster = events.Broadcaster(lambda since: run_in_threadpool(_changes_after, since))
+    await events.broadcaster.start()
+    yield
+    await events.broadcaster.stop()
+    events.broadcaster = None
+    compaction.cancel()
+    if summary_worker.refresher is not None:
+        await summary_worker.refresher.stop()
+        summary_worker.refresher = None
+    if write_queue is not None:
+        write_queue.stop()
+        write_queue = None
+    metrics.mark_process_dead()
+
+app = FastAPI(lifespan=lifespan)
+
+app.add_middleware(metrics.QueryStatsMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
 
 # CORS
 origins = [
@@ -26,61 +90,535 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[
+        "X-Next-Cursor", "X-Summary-Cache", "X-Summary-Source", "X-Summary-Age", "X-Summary-Stale",
+        "ETag", "Last-Modified", "X-Changes-Head", "X-DB-Queries", "X-DB-Time",
+        "X-DB-Over-Budget",
+    ],
 )
 
+if DB_MODE == "async":
+    # Registered before the sync handlers below so these take precedence
+    app.include_router(async_api.router)
+
 # Dependency
 def get_db():
-    db = SessionLocal()
+    # With the writer running, requests only ever read through their session
+    db = database.ReadSessionLocal() if write_queue is not None else SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
+def _write(db: Session, op):
+    """
+    Runs a write operation and commits it.
+
+    `op` takes a Session and returns a value that stays usable after the
+    transaction ends. It runs on the single writer when it is enabled and on
+    the request session otherwise.
+    """
+    if write_queue is not None:
+        result = write_queue.submit(op).result()
+    else:
+        result = op(db)
+        db.commit()
+    # Ops return None, 0 rows or no ids when nothing matched; caches and
+    # subscribers only hear about writes that changed something
+    if result is not None and result != 0 and result != []:
+        _todos_changed()
+    return result
+
+def _todos_changed():
+    summary_cache.cache.invalidate()
+    summary_worker.notify_write()
+    events.notify_write()
+
 @app.post("/todos/", response_model=schemas.Todo)
 def create_todo(todo: schemas.TodoCreate, db: Session = Depends(get_db)):
-    db_todo = models.Todo(**todo.model_dump())
-    db.add(db_todo)
-    db.commit()
-    db.refresh(db_todo)
-    return db_todo
+    def op(session: Session):
+        db_todo = models.Todo(**todo.model_dump())
+        session.add(db_todo)
+        session.flush()
+        session.refresh(db_todo)
+        return schemas.Todo.model_validate(db_todo)
+
+    return _write(db, op)
+
+BULK_MAX_TODOS = int(os.getenv("BULK_MAX_TODOS", "10000"))
+
+_todo_create_list = TypeAdapter(List[schemas.TodoCreate])
+
+# exclude_unset drops `todos` when it was never set (echo=false) while the
+# echoed todos keep their null fields, as every other endpoint returns them
+@app.post("/todos/bulk", response_model=schemas.TodoBulkResult, response_model_exclude_unset=True)
+async def create_todos_bulk(request: Request, echo: bool = False, db: Session = Depends(get_db)):
+    # Validate the whole array in one pass instead of per-item body parsing
+    try:
+        todos = _todo_create_list.validate_json(await request.body())
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)]
+        )
+    if len(todos) > BULK_MAX_TODOS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_TODOS} todos per request")
+    rows = [todo.model_dump() for todo in todos]
+
+    def op(session: Session):
+        if not rows:
+            return []
+        # executemany with RETURNING is sent as multi-row INSERTs of up to
+        # insertmanyvalues_page_size rows each. sort_by_parameter_order would
+        # fall back to one INSERT per row here (todos has no sentinel column);
+        # instead rely on the writing transaction assigning ascending ids in
+        # the order the rows were sent, and sort by id
+        returning = models.Todo if echo else models.Todo.id
+        inserted = session.scalars(insert(models.Todo).returning(returning), rows).all()
+        if echo:
+            return [schemas.Todo.model_validate(todo) for todo in sorted(inserted, key=lambda todo: todo.id)]
+        return sorted(inserted)
+
+    inserted = await run_in_threadpool(_write, db, op)
+    if echo:
+        return schemas.TodoBulkResult(count=len(inserted), ids=[todo.id for todo in inserted], todos=inserted)
+    return schemas.TodoBulkResult(count=len(inserted), ids=inserted)
+
+@app.patch("/todos/", response_model=schemas.TodoBulkUpdateResult)
+def update_todos(
+    patch: schemas.TodoUpdate,
+    completed: Optional[bool] = None,
+    due_before: Optional[datetime] = None,
+    due_after: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+):
+    values = patch.model_dump(exclude_unset=True)
+    if not values:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    stmt = (
+        update(models.Todo)
+        .where(*queries.todo_filters(completed, due_before, due_after))
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    updated = _write(db, lambda session: session.execute(stmt).rowcount)
+    if updated:
+        row_cache.cache.invalidate()
+    return schemas.TodoBulkUpdateResult(updated=updated)
+
+@app.delete("/todos/", response_model=schemas.TodoBulkDeleteResult)
+def delete_todos(
+    completed: Optional[bool] = None,
+    due_before: Optional[datetime] = None,
+    due_after: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+):
+    clauses = queries.todo_filters(completed, due_before, due_after)
+    # Guard against wiping the table with a bare DELETE /todos/
+    if not clauses:
+        raise HTTPException(status_code=400, detail="At least one filter is required")
+    stmt = delete(models.Todo).where(*clauses).execution_options(synchronize_session=False)
+    deleted = _write(db, lambda session: session.execute(stmt).rowcount)
+    if deleted:
+        row_cache.cache.invalidate()
+    return schemas.TodoBulkDeleteResult(deleted=deleted)
 
 @app.get("/todos/", response_model=List[schemas.Todo])
-def get_todos(db: Session = Depends(get_db)):
-    return db.query(models.Todo).all()
+def get_todos(
+    request: Request,
+    response: Response,
+    limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    completed: Optional[bool] = None,
+    due_before: Optional[datetime] = None,
+    due_after: Optional[datetime] = None,
+    sort: str = Query("id", pattern="^(id|due_date|created_at)$"),
+    fields: Optional[str] = Query(None, pattern=serialization.FIELDS_PATTERN),
+    db: Session = Depends(get_db),
+):
+    not_modified = versioning.conditional(
+        request, response, versioning.current(db), request.url.path, request.url.query
+    )
+    if not_modified is not None:
+        return not_modified
+
+    filters = queries.todo_filters(completed, due_before, due_after)
+    fields = serialization.parse_fields(fields)
+    try:
+        stmt = queries.list_todos_statement(limit, cursor, sort, filters, serialization.projection(fields).columns)
+    except pagination.InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    rows = db.execute(stmt).all()
+    next_page = queries.next_cursor(rows, limit, sort)
+    if next_page is not None:
+        response.headers["X-Next-Cursor"] = next_page
+    # Serialized straight from the rows; returning a Response skips
+    # response_model validation, which stays only for the OpenAPI schema
+    return Response(serialization.todos_json(rows[:limit], fields), media_type="application/json", headers=response.headers)
+
+@app.get("/todos/changes", response_model=schemas.TodoChangesPage)
+def get_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+):
+    """
+    Changes to todos after `since`, oldest first, one entry per todo with its
+    current state or a tombstone. Answers 410 when entries after `since` were
+    compacted away: the client reloads GET /todos/ and continues from the
+    X-Changes-Head header, replaying any change it already has is harmless.
+    """
+    try:
+        page = changes.changes_since(db, since, limit)
+    except changes.ResyncRequired as e:
+        raise HTTPException(status_code=410, detail="Resync required", headers={"X-Changes-Head": str(e.head)})
+
+    return schemas.TodoChangesPage(
+        changes=[_change(row) for row in page.rows], next_since=page.next_since, has_more=page.has_more
+    )
+
+def _change(row) -> schemas.TodoChange:
+    return schemas.TodoChange(
+        seq=row.seq,
+        id=row.todo_id,
+        deleted=row.deleted,
+        todo=None if row.deleted else schemas.Todo.model_validate(row),
+    )
+
+def _changes_after(since: Optional[int]) -> Tuple[List[dict], int]:
+    # Feeds the event broadcaster, outside any request
+    with database.ReadSessionLocal() as db:
+        if since is None:
+            return [], changes.head(db)
+        batch = []
+        while True:
+            page = changes.changes_since(db, since, pagination.MAX_PAGE_SIZE)
+            batch += [_change(row).model_dump(mode="json") for row in page.rows]
+            since = page.next_since
+            if not page.has_more:
+                return batch, since
+
+@app.get("/todos/events")
+async def todo_events(request: Request):
+    """
+    Pushes todo changes as Server-Sent Events. Each `changes` event holds
+    the entries GET /todos/changes would return and carries the seq as its
+    id, so a reconnecting EventSource resumes where it left off. A client
+    that falls too far behind gets a `dropped` event and should reconnect;
+    one whose position was compacted away gets `resync`.
+    """
+    broadcaster = events.broadcaster
+    if broadcaster is None:
+        raise HTTPException(status_code=503, detail="Event stream is not running")
+    last_event_id = request.headers.get("last-event-id")
+    subscriber = broadcaster.subscribe()
+    return StreamingResponse(
+        broadcaster.stream(subscriber, int(last_event_id) if last_event_id and last_event_id.isdigit() else None),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def _compact_changes() -> int:
+    op = changes.compact
+    if write_queue is not None:
+        return write_queue.submit(op).result()
+    with SessionLocal() as session:
+        removed = op(session)
+        session.commit()
+    return removed
+
+async def _compact_changes_periodically():
+    while True:
+        await asyncio.sleep(changes.CHANGES_COMPACT_INTERVAL)
+        try:
+            removed = await run_in_threadpool(_compact_changes)
+            logger.info("Compacted %d changelog entries", removed)
+        except Exception:
+            logger.exception("Changelog compaction failed")
+
+@app.get("/todos/search", response_model=List[schemas.TodoSearchHit])
+def search_todos(
+    response: Response,
+    q: str = Query(..., min_length=1),
+    limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    try:
+        rows = search.search(db, q, limit, cursor)
+    except pagination.InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    next_page = search.next_cursor(rows, limit)
+    if next_page is not None:
+        response.headers["X-Next-Cursor"] = next_page
+    return [schemas.TodoSearchHit.model_validate(row) for row in rows[:limit]]
+
+EXPORT_BATCH_SIZE = 500
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "json": "application/json",
+}
+
+def _export_rows(bind, fmt: str):
+    # Uses its own connection so the stream outlives the request-scoped session
+    with bind.connect() as conn:
+        rows = conn.execution_options(yield_per=EXPORT_BATCH_SIZE).execute(
+            select(models.Todo.__table__).order_by(models.Todo.id)
+        )
+        if fmt == "json":
+            yield "["
+        # One chunk per fetched batch: StreamingResponse runs this generator
+        # in the threadpool, one hop per chunk
+        for i, partition in enumerate(rows.partitions()):
+            lines = [schemas.Todo.model_validate(row).model_dump_json() for row in partition]
+            if fmt == "ndjson":
+                yield "\n".join(lines) + "\n"
+            else:
+                yield ("" if i == 0 else ",") + ",".join(lines)
+        if fmt == "json":
+            yield "]"
+
+@app.get("/todos/export")
+def export_todos(format: str = Query("ndjson", pattern="^(ndjson|json)$"), db: Session = Depends(get_db)):
+    return StreamingResponse(_export_rows(db.get_bind(), format), media_type=EXPORT_MEDIA_TYPES[format])
+
+def _local_summary(bind) -> str:
+    # Own session, so it also works from a response stream after the
+    # request-scoped session has been closed
+    with Session(bind=bind) as session:
+        return local_summary.generate_local_summary(session, date.today())
+
+async def _summary_source(db: Session):
+    """
+    Returns (cache key, prompt factory) for the current todos; the factory is
+    None when there are no todos.
+
+    A compact prompt is built up front from bucket counts and keyed by its own
+    hash. A full prompt is keyed by the todos and prepared only on a cache
+    miss, since long lists need map-reduce calls first.
+    """
+    today = date.today()
+    if ai_summary.SUMMARY_PROMPT == "compact":
+        context = await run_in_threadpool(local_summary.prompt_context, db, today, ai_summary.SUMMARY_TOP_N)
+        if not context.buckets:
+            return summary_cache.cache_key([], today), None
+        counts = {name: bucket.count for name, bucket in context.buckets.items()}
+        prompt = ai_summary.build_compact_prompt(counts, context.overdue, context.upcoming, today)
+
+        async def ready():
+            return prompt
+
+        return ai_summary.prompt_hash(prompt), ready
+
+    todos = await run_in_threadpool(lambda: db.query(models.Todo).all())
+    if not todos:
+        return summary_cache.cache_key([], today), None
+    return summary_cache.cache_key(todos, today), lambda: ai_summary.prepare_prompt(todos)
+
+async def _generate_summary(db: Session, bounded: bool = True) -> Tuple[str, str, str]:
+    """
+    Returns (summary, source, cache status) for the current todos; bounded
+    as for ai_summary.summarize.
+    """
+    if ai_summary.SUMMARY_BACKEND == "local":
+        return await run_in_threadpool(_local_summary, db.get_bind()), "local", "bypass"
+
+    key, make_prompt = await _summary_source(db)
+    summary = summary_cache.cache.get(key)
+    if summary is not None:
+        return summary, "llm", "hit"
+
+    if make_prompt is None:
+        summary = ai_summary.NO_TODOS_MESSAGE
+    else:
+        summary = await ai_summary.summarize(make_prompt, bounded)
+    if summary is None:
+        # Not cached, the next request should retry the model
+        return await run_in_threadpool(_local_summary, db.get_bind()), "local", "miss"
+    summary_cache.cache.set(key, summary)
+    return summary, "llm", "miss"
+
+async def _refresh_summary() -> Tuple[str, str, int, date]:
+    # Runs outside any request, so it opens its own session. The version is
+    # read first: a write landing meanwhile makes the summary look older
+    # than it is, never newer.
+    db = database.ReadSessionLocal()
+    try:
+        today = date.today()
+        version = await run_in_threadpool(versioning.current, db)
+        summary, source, _ = await _generate_summary(db, bounded=False)
+    finally:
+        db.close()
+    return summary, source, version.version, today
 
 @app.get("/todos/summary", response_model=str)
-def get_summary(db: Session = Depends(get_db)):
-    todos = db.query(models.Todo).all()
-    return ai_summary.generate_summary(todos)
+async def get_summary(request: Request, response: Response, db: Session = Depends(get_db)):
+    # The day is part of the tag: overdue and due today change at midnight
+    version = await run_in_threadpool(versioning.current, db)
+    today = date.today()
+    tag = versioning.etag(version, request.url.path, today, ai_summary.SUMMARY_BACKEND)
+    if versioning.is_not_modified(request, tag, version):
+        return versioning.not_modified(tag, version)
+
+    refresher = summary_worker.refresher
+    if refresher is not None:
+        try:
+            # A synchronous refresh isn't bounded itself; past the timeout it
+            # carries on for later requests while this one falls back
+            snapshot = await asyncio.wait_for(
+                asyncio.shield(refresher.current(version.version, today)), ai_summary.LLM_SUMMARY_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            summary, source, stale = await run_in_threadpool(_local_summary, db.get_bind()), "local", False
+        else:
+            summary, source, stale = snapshot.summary, snapshot.source, snapshot.stale
+            response.headers["X-Summary-Age"] = f"{snapshot.age:.1f}"
+            response.headers["X-Summary-Stale"] = "true" if stale else "false"
+    else:
+        summary, source, cache_status = await _generate_summary(db)
+        stale = False
+        if cache_status != "bypass":
+            response.headers["X-Summary-Cache"] = cache_status
+    response.headers["X-Summary-Source"] = source
+
+    # Only a current summary from the configured backend may be revalidated
+    # later; a stale one or a fallback after a model error must be refetched
+    if not stale and (source == "llm" or ai_summary.SUMMARY_BACKEND == "local"):
+        versioning.set_headers(response, tag, version)
+    return summary
+
+@app.get("/todos/summary/stats")
+def get_summary_stats():
+    """
+    Prompt sizes and token usage of the summaries generated so far.
+    """
+    return ai_summary.prompt_stats.stats()
+
+@app.get("/todos/summary/stream")
+async def stream_summary(db: Session = Depends(get_db)):
+    """
+    Streams the summary as Server-Sent Events: one `delta` event per token,
+    then a `done` event with token usage and cache metadata, or an `error` event.
+    """
+    bind = db.get_bind()
+    if ai_summary.SUMMARY_BACKEND == "local":
+        async def local_events():
+            yield events.sse("delta", {"content": await run_in_threadpool(_local_summary, bind)})
+            yield events.sse("done", {"cached": False, "source": "local", "usage": None})
+
+        return StreamingResponse(local_events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+    key, make_prompt = await _summary_source(db)
+    cached = summary_cache.cache.get(key)
+
+    async def llm_events():
+        if cached is not None or make_prompt is None:
+            yield events.sse("delta", {"content": cached or ai_summary.NO_TODOS_MESSAGE})
+            yield events.sse("done", {"cached": cached is not None, "source": "llm", "cache_key": key, "usage": None})
+            return
+
+        parts = []
+        usage = None
+        try:
+            # Nothing within LLM_SUMMARY_TIMEOUT falls back to the local summary
+            async for delta, chunk_usage in ai_summary.stream_summary(make_prompt):
+                if delta:
+                    parts.append(delta)
+                    yield events.sse("delta", {"content": delta})
+                usage = chunk_usage or usage
+        except Exception:
+            logger.exception("Streaming the summary failed")
+            if parts:
+                # Part of the answer is already on screen, don't mix in another one
+                yield events.sse("error", {"message": ai_summary.ERROR_MESSAGE})
+                return
+            yield events.sse("delta", {"content": await run_in_threadpool(_local_summary, bind)})
+            yield events.sse("done", {"cached": False, "source": "local", "usage": None})
+            return
+
+        summary_cache.cache.set(key, "".join(parts).strip())
+        yield events.sse("done", {"cached": False, "source": "llm", "cache_key": key, "usage": usage})
+
+    return StreamingResponse(
+        llm_events(),
+        media_type="text/event-stream",
+        # Proxies must not buffer the stream or time-to-first-token is lost
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @app.get("/todos/{todo_id}", response_model=schemas.Todo)
-def get_todo(todo_id: int, db: Session = Depends(get_db)):
-    db_todo = db.query(models.Todo).filter(models.Todo.id == todo_id).first()
-    if db_todo is None:
-        raise HTTPException(status_code=404, detail="Todo not found")
-    return db_todo
+def get_todo(todo_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
+    version = versioning.current(db)
+    not_modified = versioning.conditional(request, response, version, request.url.path)
+    if not_modified is not None:
+        return not_modified
+
+    row_cache.cache.sync(db, version.version)
+    body = row_cache.cache.get(todo_id)
+    if body is None:
+        row = db.execute(select(*models.Todo.__table__.c).where(models.Todo.id == todo_id)).first()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Todo not found")
+        body = serialization.todo_json(row)
+        row_cache.cache.set(todo_id, body, version.version)
+    return Response(body, media_type="application/json", headers=response.headers)
 
 @app.put("/todos/{todo_id}", response_model=schemas.Todo)
 def update_todo(todo_id: int, todo: schemas.TodoCreate, db: Session = Depends(get_db)):
-    db_todo = db.query(models.Todo).filter(models.Todo.id == todo_id).first()
-    if db_todo is None:
+    def op(session: Session):
+        db_todo = session.get(models.Todo, todo_id)
+        if db_todo is None:
+            return None
+
+        for key, value in todo.model_dump().items():
+            setattr(db_todo, key, value)
+
+        session.flush()
+        session.refresh(db_todo)
+        return schemas.Todo.model_validate(db_todo)
+
+    updated = _write(db, op)
+    row_cache.cache.evict(todo_id)
+    if updated is None:
         raise HTTPException(status_code=404, detail="Todo not found")
-    
-    for key, value in todo.model_dump().items():
-        setattr(db_todo, key, value)
-    
-    db.commit()
-    db.refresh(db_todo)
-    return db_todo
+    return updated
+
+@app.patch("/todos/{todo_id}", response_model=schemas.Todo)
+def patch_todo(todo_id: int, patch: schemas.TodoUpdate, db: Session = Depends(get_db)):
+    values = patch.model_dump(exclude_unset=True)
+    stmt = queries.patch_todo_statement(todo_id, values)
+    if values:
+        row = _write(db, lambda session: session.execute(stmt).first())
+        row_cache.cache.evict(todo_id)
+    else:
+        row = db.execute(stmt).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Todo not found")
+    return schemas.Todo.model_validate(row)
 
 @app.delete("/todos/{todo_id}", response_model=schemas.Todo)
 def delete_todo(todo_id: int, db: Session = Depends(get_db)):
-    db_todo = db.query(models.Todo).filter(models.Todo.id == todo_id).first()
-    if db_todo is None:
+    stmt = queries.delete_todo_statement(todo_id)
+    row = _write(db, lambda session: session.execute(stmt).first())
+    row_cache.cache.evict(todo_id)
+    if row is None:
         raise HTTPException(status_code=404, detail="Todo not found")
-    db.delete(db_todo)
-    db.commit()
-    return db_todo
+    return schemas.Todo.model_validate(row)
+
+@app.get("/cache/stats")
+def get_cache_stats():
+    return {
+        "summary": summary_cache.cache.stats(),
+        "partials": summary_cache.partials.stats(),
+        "rows": row_cache.cache.stats(),
+    }
+
+@app.get("/metrics")
+def get_metrics():
+    data, content_type = metrics.render()
+    return Response(data, media_type=content_type)
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,197 @@
+import logging
+import os
+import time
+from typing import Optional, Tuple
+import anyio.to_thread
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+)
+# from . import database
+import database
+
+logger = logging.getLogger(__name__)
+
+# With several worker processes set PROMETHEUS_MULTIPROC_DIR to an empty
+# directory shared by all of them: every process then writes its samples
+# there and /metrics, whichever worker answers, aggregates all of them.
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "Requests being handled", ["method"], multiprocess_mode="livesum"
+)
+# Server-Sent Event streams stay open for as long as the client listens;
+# they are tracked here instead of in the request metrics above
+EVENT_STREAMS_OPEN = Gauge(
+    "http_event_streams_open", "Server-Sent Event streams being served", ["route"], multiprocess_mode="livesum"
+)
+EVENT_STREAM_DURATION = Histogram(
+    "http_event_stream_duration_seconds",
+    "How long Server-Sent Event streams stayed open",
+    ["route"],
+    buckets=(1.0, 10.0, 60.0, 300.0, 900.0, 3600.0, 4 * 3600.0, 24 * 3600.0),
+)
+THREADPOOL_BUSY = Gauge(
+    "threadpool_busy_threads", "Worker threads running sync handlers and run_in_threadpool calls",
+    multiprocess_mode="livesum",
+)
+THREADPOOL_SIZE = Gauge("threadpool_max_threads", "Worker thread limit", multiprocess_mode="livesum")
+
+DB_QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds",
+    "SQL statement latency by statement type",
+    ["operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+DB_QUERY_ERRORS = Counter("db_query_errors_total", "SQL statements that raised", ["operation"])
+QUERY_BUDGET_EXCEEDED = Counter(
+    "http_requests_over_query_budget_total", "Requests that ran more statements than QUERY_BUDGET", ["method", "route"]
+)
+
+LLM_LATENCY = Histogram(
+    "llm_request_duration_seconds",
+    "Model call latency, to the last token for streams",
+    ["kind"],
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0),
+)
+LLM_TOKENS = Counter("llm_tokens_total", "Tokens reported by the model", ["type"])
+LLM_ERRORS = Counter("llm_errors_total", "Model calls that failed", ["kind"])
+
+
+def render() -> Tuple[bytes, str]:
+    """
+    Returns the metrics page and its content type.
+    """
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead():
+    """
+    Drops this process's live gauges from the shared directory on shutdown.
+    """
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+def record_llm_usage(usage):
+    # Responses without usage (or test doubles) are not counted
+    if isinstance(getattr(usage, "prompt_tokens", None), int):
+        LLM_TOKENS.labels("prompt").inc(usage.prompt_tokens)
+        LLM_TOKENS.labels("completion").inc(usage.completion_tokens)
+
+
+def _operation(statement: str) -> str:
+    words = statement.lstrip().split(None, 1)
+    return words[0].upper() if words else "UNKNOWN"
+
+
+def _observe_statement(statement: str, duration: Optional[float]):
+    if duration is None:
+        DB_QUERY_ERRORS.labels(_operation(statement)).inc()
+    else:
+        DB_QUERY_LATENCY.labels(_operation(statement)).observe(duration)
+
+
+# Statements are timed by database's engine listeners
+database.statement_hooks.append(_observe_statement)
+
+
+class MetricsMiddleware:
+    """
+    Times every HTTP request and labels it with the route template
+    (/todos/{todo_id}, not /todos/42), so label cardinality stays bounded.
+    Responses of type text/event-stream leave the request metrics once
+    their headers are sent and are counted as open streams instead.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        status = {"code": 500}
+        stream = {}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                content_type = dict(message.get("headers", [])).get(b"content-type", b"")
+                if content_type.startswith(b"text/event-stream"):
+                    in_flight.dec()
+                    stream["route"] = getattr(scope.get("route"), "path", "unmatched")
+                    stream["started"] = time.perf_counter()
+                    EVENT_STREAMS_OPEN.labels(stream["route"]).inc()
+            await send(message)
+
+        limiter = anyio.to_thread.current_default_thread_limiter()
+        THREADPOOL_SIZE.set(limiter.total_tokens)
+        THREADPOOL_BUSY.set(limiter.borrowed_tokens)
+        # The route is only known once the router matched it, so requests in
+        # flight are counted by method alone
+        in_flight = REQUESTS_IN_FLIGHT.labels(method)
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if stream:
+                EVENT_STREAMS_OPEN.labels(stream["route"]).dec()
+                EVENT_STREAM_DURATION.labels(stream["route"]).observe(time.perf_counter() - stream["started"])
+            else:
+                in_flight.dec()
+                route = scope.get("route")
+                REQUEST_LATENCY.labels(
+                    method, getattr(route, "path", "unmatched"), str(status["code"])
+                ).observe(time.perf_counter() - started)
+            THREADPOOL_BUSY.set(limiter.borrowed_tokens)
+
+
+class QueryStatsMiddleware:
+    """
+    Collects database.QueryStats for every HTTP request, reports them in
+    response headers when QUERY_DEBUG_HEADERS is on, and logs requests over
+    QUERY_BUDGET with their most repeated statement.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = database.QueryStats()
+
+        async def send_wrapper(message):
+            # Statements run while a streamed body is sent are not in the
+            # headers, only in the budget check below
+            if message["type"] == "http.response.start" and database.QUERY_DEBUG_HEADERS:
+                headers = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in stats.headers().items()]
+                message = {**message, "headers": list(message.get("headers", [])) + headers}
+            await send(message)
+
+        token = database.query_stats.set(stats)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            database.query_stats.reset(token)
+            if stats.over_budget():
+                route = getattr(scope.get("route"), "path", "unmatched")
+                QUERY_BUDGET_EXCEEDED.labels(scope["method"], route).inc()
+                statement, runs = stats.fingerprints.most_common(1)[0]
+                logger.warning(
+                    "%s %s ran %d queries (budget %d) in %.1f ms; most repeated, %d times: %s",
+                    scope["method"], scope["path"], stats.count, database.QUERY_BUDGET,
+                    stats.duration * 1000, runs, statement,
+                )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Index, text
 # from .database import Base
 from database import Base
 from datetime import datetime
@@ -7,8 +7,37 @@ class Todo(Base):
     __tablename__ = "todos"
 
     id = Column(Integer, primary_key=True, index=True)
-    title = Column(String, index=True)
-    description = Column(String, index=True)
+    title = Column(String)
+    description = Column(String)
     completed = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.now)
     due_date = Column(DateTime, nullable=True)
+
+    # Every secondary index implicitly ends with id (the rowid), so each one
+    # also serves the (column, id) keyset order used for pagination
+    __table_args__ = (
+        # ?completed= with sort=due_date, with or without a due date range
+        Index("ix_todos_completed_due_date", "completed", "due_date"),
+        # ?completed= with sort=created_at
+        Index("ix_todos_completed_created_at", "completed", "created_at"),
+        # ?due_before= / ?due_after= under any sort (see queries.list_todos_statement)
+        Index("ix_todos_due_date", "due_date"),
+        Index("ix_todos_created_at", "created_at"),
+        # Pending or done todos only, in id order: ?completed= pages with the
+        # default sort are read straight off these small indexes with no sort step
+        Index("ix_todos_pending", "completed", sqlite_where=text("completed = 0")),
+        Index("ix_todos_done", "completed", sqlite_where=text("completed = 1")),
+    )
+
+# Indexes created by earlier versions of the model that no query uses
+LEGACY_INDEXES = ("ix_todos_title", "ix_todos_description")
+
+def upgrade_indexes(bind):
+    """
+    Brings the indexes of an existing todos table in line with the model.
+    """
+    with bind.begin() as conn:
+        for name in LEGACY_INDEXES:
+            conn.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+        for index in Todo.__table__.indexes:
+            index.create(bind=conn, checkfirst=True)
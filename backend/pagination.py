@@ -0,0 +1,34 @@
+import base64
+import binascii
+import json
+import os
+
+# Page size used when the client does not pass ?limit=, and the hard upper bound.
+DEFAULT_PAGE_SIZE = int(os.getenv("TODOS_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = int(os.getenv("TODOS_MAX_PAGE_SIZE", "1000"))
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor sent by a client cannot be decoded."""
+
+
+def encode_cursor(position: dict) -> str:
+    """
+    Encodes the keyset position of the last row on a page as an opaque token.
+    """
+    raw = json.dumps(position, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    """
+    Decodes a token produced by encode_cursor back into its keyset position.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor(cursor)
+    if not isinstance(position, dict) or not isinstance(position.get("id"), int):
+        raise InvalidCursor(cursor)
+    return position
@@ -0,0 +1,134 @@
+from datetime import datetime
+from typing import List, Optional, Sequence
+from sqlalchemy import and_, delete, false, or_, select, true, tuple_, update
+from sqlalchemy.sql.expression import UnaryExpression
+from sqlalchemy.sql.operators import custom_op
+# from . import models, pagination
+import models
+import pagination
+
+
+# Orderings GET /todos/ can page through; id breaks ties in the others
+SORT_COLUMNS = {
+    "id": models.Todo.id,
+    "due_date": models.Todo.due_date,
+    "created_at": models.Todo.created_at,
+}
+
+
+def list_todos_statement(
+    limit: int, cursor: Optional[str] = None, sort: str = "id", filters: List = (), columns: Sequence = ()
+):
+    """
+    Builds the keyset-paginated SELECT behind GET /todos/.
+
+    Selects plain column rows rather than ORM instances, see
+    serialization.todos_json: the given columns (all by default), followed
+    by the sort column if it is not among them, since next_cursor needs it.
+    One row more than `limit` is requested so callers can tell whether a
+    next page exists. Raises pagination.InvalidCursor for a malformed cursor.
+    """
+    columns = list(columns) or list(models.Todo.__table__.c)
+    if sort not in {column.name for column in columns}:
+        columns.append(models.Todo.__table__.c[sort])
+    stmt = select(*columns).where(*filters)
+    order = [models.Todo.id] if sort == "id" else [SORT_COLUMNS[sort], models.Todo.id]
+    if sort != "due_date" and any(_filters_on(clause, models.Todo.due_date) for clause in filters):
+        # Left alone, SQLite walks the rowid or ix_todos_created_at in page
+        # order and tests every row against the due date range; no index
+        # holds both. A unary + keeps the ORDER BY terms off the indexes, so
+        # the range is searched in ix_todos_due_date (or a completed index)
+        # and only the matching rows are sorted.
+        order = [_unindexed(column) for column in order]
+    stmt = stmt.order_by(*order)
+    if cursor is not None:
+        stmt = stmt.where(_after(pagination.decode_cursor(cursor), sort))
+    return stmt.limit(limit + 1)
+
+
+def _filters_on(clause, column) -> bool:
+    left = getattr(clause, "left", None)
+    return left is not None and left.compare(column.expression)
+
+
+def _unindexed(column):
+    return UnaryExpression(column.expression, operator=custom_op("+"))
+
+
+def _after(position: dict, sort: str):
+    if sort == "id":
+        return models.Todo.id > position["id"]
+    if sort not in position:
+        raise pagination.InvalidCursor(position)
+    column = SORT_COLUMNS[sort]
+    try:
+        value = None if position[sort] is None else datetime.fromisoformat(position[sort])
+    except (TypeError, ValueError):
+        raise pagination.InvalidCursor(position)
+    if value is None:
+        # NULLs sort first, so the rest of the NULL run and then every dated row
+        return or_(and_(column.is_(None), models.Todo.id > position["id"]), column.is_not(None))
+    return tuple_(column, models.Todo.id) > tuple_(value, position["id"])
+
+
+def next_cursor(todos: list, limit: int, sort: str = "id") -> Optional[str]:
+    """
+    Returns the cursor for the page after `todos`, or None on the last page.
+    """
+    if len(todos) <= limit:
+        return None
+    last = todos[limit - 1]
+    position = {"id": last.id}
+    if sort != "id":
+        value = getattr(last, sort)
+        position[sort] = None if value is None else value.isoformat()
+    return pagination.encode_cursor(position)
+
+
+def patch_todo_statement(todo_id: int, values: dict):
+    """
+    Single-statement partial update returning the updated row, or a plain
+    SELECT of the row when there is nothing to change.
+    """
+    columns = models.Todo.__table__.c
+    if not values:
+        return select(*columns).where(models.Todo.id == todo_id)
+    return (
+        update(models.Todo)
+        .where(models.Todo.id == todo_id)
+        .values(**values)
+        .returning(*columns)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def delete_todo_statement(todo_id: int):
+    """
+    Single-statement delete returning the deleted row.
+    """
+    return (
+        delete(models.Todo)
+        .where(models.Todo.id == todo_id)
+        .returning(*models.Todo.__table__.c)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def todo_filters(
+    completed: Optional[bool] = None,
+    due_before: Optional[datetime] = None,
+    due_after: Optional[datetime] = None,
+) -> List:
+    """
+    Translates the todo filter query parameters into WHERE clauses.
+    """
+    clauses = []
+    if completed is not None:
+        # Compared against a literal so SQLite can match the partial index on
+        # pending todos, which a bound parameter would not
+        clauses.append(models.Todo.completed == (true() if completed else false()))
+    if due_before is not None:
+        clauses.append(models.Todo.due_date < due_before)
+    if due_after is not None:
+        clauses.append(models.Todo.due_date > due_after)
+    return clauses
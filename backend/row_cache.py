@@ -0,0 +1,138 @@
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+# from . import changes
+import changes
+
+ROW_CACHE_SIZE = int(os.getenv("ROW_CACHE_SIZE", "10000"))
+ROW_CACHE_TTL = float(os.getenv("ROW_CACHE_TTL", "60"))
+
+# Per-entry memory besides the row's bytes: the (expiry, body) tuple, the
+# float, the bytes object header and the int key
+_ENTRY_OVERHEAD = sys.getsizeof((0.0, b"")) + sys.getsizeof(0.0) + sys.getsizeof(b"") + sys.getsizeof(2 ** 40)
+
+
+class RowCache:
+    """
+    Thread-safe LRU cache of serialized todos keyed by id, with a per-entry TTL.
+
+    Writes in this process evict their ids directly. Writes from any process
+    are picked up by sync, which every read calls with the data version it
+    observed: when the version moved, the ids written since the last sync
+    are looked up in the changelog and evicted.
+    """
+
+    def __init__(self, max_entries: int = ROW_CACHE_SIZE, ttl: float = ROW_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.syncs = 0
+        self._bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Data version and changelog seq the entries are known to be current for
+        self._version = None
+        self._seq = None
+
+    def sync(self, db, version: int):
+        """
+        Brings the cache up to `version`, read in the same transaction as db.
+        """
+        with self._lock:
+            # Versions only grow; a request still reading an older snapshot
+            # has nothing to add
+            if self._version is not None and version <= self._version:
+                return
+            seq = self._seq
+        try:
+            if seq is None:
+                raise changes.ResyncRequired(0)
+            ids, seq = changes.changed_ids(db, seq)
+        except changes.ResyncRequired:
+            ids, seq = None, changes.head(db)
+        with self._lock:
+            if ids is None:
+                self._clear()
+            else:
+                for todo_id in ids:
+                    self._evict(todo_id)
+            if self._version is None or version > self._version:
+                self._version, self._seq = version, seq
+            self.syncs += 1
+
+    def get(self, todo_id: int) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(todo_id)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._evict(todo_id)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(todo_id)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, todo_id: int, body: bytes, version: int):
+        """
+        Caches a row read at `version`; ignored if the cache has synced to
+        another version since, as the row may already be outdated.
+        """
+        with self._lock:
+            if version != self._version:
+                return
+            self._evict(todo_id)
+            self._entries[todo_id] = (time.monotonic() + self.ttl, body)
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def evict(self, todo_id: int):
+        with self._lock:
+            self._evict(todo_id)
+
+    def invalidate(self):
+        """
+        Drops every entry; used after writes that don't report their ids.
+        """
+        with self._lock:
+            self._clear()
+
+    def _evict(self, todo_id: int):
+        entry = self._entries.pop(todo_id, None)
+        if entry is not None:
+            self._bytes -= len(entry[1])
+
+    def _clear(self):
+        self._entries.clear()
+        self._bytes = 0
+        self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            size = len(self._entries)
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "size": size,
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "syncs": self.syncs,
+                # Serialized rows alone, then with the structures holding them
+                "bytes": self._bytes,
+                "approx_memory_bytes": self._bytes + sys.getsizeof(self._entries) + size * _ENTRY_OVERHEAD,
+            }
+
+
+cache = RowCache()
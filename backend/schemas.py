@@ -1,5 +1,6 @@
-from pydantic import BaseModel, ConfigDict
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, field_validator
+from typing import List, Optional
+from typing_extensions import TypedDict
 from datetime import datetime
 
 class TodoBase(BaseModel):
@@ -11,8 +12,65 @@ class TodoBase(BaseModel):
 class TodoCreate(TodoBase):
     pass
 
+class TodoUpdate(BaseModel):
+    """
+    Partial update: only the fields present in the request body are changed.
+    """
+    title: Optional[str] = None
+    description: Optional[str] = None
+    completed: Optional[bool] = None
+    due_date: Optional[datetime] = None
+
+    @field_validator("title", "completed")
+    @classmethod
+    def not_null(cls, value):
+        # Omitting these is fine, explicitly clearing them is not
+        if value is None:
+            raise ValueError("may not be null")
+        return value
+
 class Todo(TodoBase):
     id: int
     created_at: datetime
 
     model_config = ConfigDict(from_attributes=True)
+
+class TodoRow(TypedDict):
+    """
+    Same fields as Todo, for serializing plain row dicts without validation.
+    """
+    id: int
+    title: str
+    description: Optional[str]
+    completed: bool
+    due_date: Optional[datetime]
+    created_at: datetime
+
+class TodoSearchHit(Todo):
+    rank: float
+    title_snippet: Optional[str] = None
+    description_snippet: Optional[str] = None
+
+class TodoChange(BaseModel):
+    seq: int
+    id: int
+    deleted: bool
+    # Current state of the todo; None for a tombstone
+    todo: Optional[Todo] = None
+
+class TodoChangesPage(BaseModel):
+    changes: List[TodoChange]
+    # Pass as ?since= to get the next page, or later the next changes
+    next_since: int
+    has_more: bool
+
+class TodoBulkResult(BaseModel):
+    count: int
+    ids: List[int]
+    todos: Optional[List[Todo]] = None
+
+class TodoBulkUpdateResult(BaseModel):
+    updated: int
+
+class TodoBulkDeleteResult(BaseModel):
+    deleted: int
@@ -0,0 +1,112 @@
+import re
+from typing import List, Optional
+from sqlalchemy import event, text
+# from . import models, pagination
+import models
+import pagination
+
+# External-content FTS5 index over todos: the text lives only in `todos`, the
+# triggers keep the index in step with every INSERT, UPDATE and DELETE.
+# prefix='2 3' adds prefix indexes so short "abc*" queries avoid a term scan.
+FTS_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS todos_fts USING fts5(
+        title, description,
+        content='todos', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS todos_fts_insert AFTER INSERT ON todos BEGIN
+        INSERT INTO todos_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS todos_fts_delete AFTER DELETE ON todos BEGIN
+        INSERT INTO todos_fts(todos_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS todos_fts_update AFTER UPDATE OF title, description ON todos BEGIN
+        INSERT INTO todos_fts(todos_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO todos_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+]
+
+SNIPPET_OPEN = "<mark>"
+SNIPPET_CLOSE = "</mark>"
+SNIPPET_TOKENS = 12
+
+SEARCH_SQL = f"""
+    SELECT todos.*, todos_fts.rank AS rank,
+           snippet(todos_fts, 0, '{SNIPPET_OPEN}', '{SNIPPET_CLOSE}', '…', {SNIPPET_TOKENS}) AS title_snippet,
+           snippet(todos_fts, 1, '{SNIPPET_OPEN}', '{SNIPPET_CLOSE}', '…', {SNIPPET_TOKENS}) AS description_snippet
+    FROM todos_fts JOIN todos ON todos.id = todos_fts.rowid
+    WHERE todos_fts MATCH :match {{after}}
+    ORDER BY todos_fts.rank, todos.id
+    LIMIT :limit
+"""
+
+_TERM = re.compile(r"(\w+)(\*?)")
+
+
+def install(connection):
+    """
+    Creates the FTS index and its triggers if missing, indexing existing rows.
+    """
+    exists = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE name = 'todos_fts'"
+    ).first()
+    for ddl in FTS_DDL:
+        connection.exec_driver_sql(ddl)
+    if not exists:
+        connection.exec_driver_sql("INSERT INTO todos_fts(todos_fts) VALUES ('rebuild')")
+
+
+@event.listens_for(models.Todo.__table__, "after_create")
+def _install_after_create(target, connection, **kw):
+    install(connection)
+
+
+def match_expression(q: str) -> Optional[str]:
+    """
+    Turns free text into an FTS5 query: every word must match, and a word
+    ending in * matches as a prefix. FTS5 syntax in the input is neutralised by
+    quoting each word, so user text can never produce a query syntax error.
+    """
+    terms = [f'"{word}"{star}' for word, star in _TERM.findall(q)]
+    return " ".join(terms) if terms else None
+
+
+def search(db, q: str, limit: int, cursor: Optional[str] = None) -> List:
+    """
+    Returns up to limit + 1 matching rows, best BM25 rank first.
+
+    Raises pagination.InvalidCursor for a malformed cursor.
+    """
+    match = match_expression(q)
+    if match is None:
+        return []
+    params = {"match": match, "limit": limit + 1}
+    after = ""
+    if cursor is not None:
+        position = pagination.decode_cursor(cursor)
+        if not isinstance(position.get("rank"), (int, float)):
+            raise pagination.InvalidCursor(cursor)
+        after = "AND (todos_fts.rank, todos.id) > (:rank, :id)"
+        params.update(rank=position["rank"], id=position["id"])
+    stmt = text(SEARCH_SQL.format(after=after)).columns(*models.Todo.__table__.c)
+    return db.execute(stmt, params).all()
+
+
+def next_cursor(rows: List, limit: int) -> Optional[str]:
+    """
+    Returns the cursor for the page after `rows`, or None on the last page.
+    """
+    if len(rows) <= limit:
+        return None
+    last = rows[limit - 1]
+    return pagination.encode_cursor({"id": last.id, "rank": last.rank})
@@ -0,0 +1,75 @@
+import functools
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+from pydantic import TypeAdapter
+from typing_extensions import TypedDict
+# from . import models, schemas
+import models
+import schemas
+
+# Column order of rows selected with select(*models.Todo.__table__.c)
+TODO_FIELDS = tuple(column.name for column in models.Todo.__table__.c)
+
+# What the list view renders; description can be large and is left out
+LIST_FIELDS = ("id", "title", "completed", "due_date")
+
+# Query pattern for ?fields=, a comma-separated subset of TODO_FIELDS
+FIELDS_PATTERN = "^({0})(,({0}))*$".format("|".join(TODO_FIELDS))
+
+
+class Projection(NamedTuple):
+    fields: Tuple[str, ...]
+    columns: tuple
+    # Serializer for a list of row dicts with exactly these fields
+    adapter: TypeAdapter
+
+
+@functools.lru_cache(maxsize=None)
+def projection(fields: Tuple[str, ...]) -> Projection:
+    """
+    Returns the columns and the pre-built serializer for a field set, in
+    table column order. Cached, so each field set pays for building its
+    TypedDict and pydantic-core serializer once.
+    """
+    row_type = schemas.TodoRow if fields == TODO_FIELDS else TypedDict(
+        "TodoRow_" + "_".join(fields), {name: schemas.TodoRow.__annotations__[name] for name in fields}
+    )
+    columns = tuple(models.Todo.__table__.c[name] for name in fields)
+    return Projection(fields, columns, TypeAdapter(List[row_type]))
+
+
+def parse_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    """
+    Turns a ?fields= value matching FIELDS_PATTERN into a canonical field
+    set. id is always included, it is what cursors are built from.
+    """
+    if not fields:
+        return TODO_FIELDS
+    wanted = set(fields.split(",")) | {"id"}
+    return tuple(name for name in TODO_FIELDS if name in wanted)
+
+
+def todos_json(rows: Iterable, fields: Tuple[str, ...] = TODO_FIELDS) -> bytes:
+    """
+    Serializes Core rows of the todos table to the JSON GET /todos/ returns.
+
+    Rows start with the columns of projection(fields) in order; any further
+    columns are ignored. Produces the same document as
+    response_model=List[schemas.Todo] (restricted to fields) without
+    building ORM instances or validating each row against the model first.
+    """
+    return projection(fields).adapter.dump_json([dict(zip(fields, row)) for row in rows])
+
+
+_todo = TypeAdapter(schemas.TodoRow)
+
+
+def todo_json(row) -> bytes:
+    """
+    Serializes one Core row of the todos table, as GET /todos/{id} returns it.
+    """
+    return _todo.dump_json(dict(zip(TODO_FIELDS, row)))
+
+
+# Compile the common field sets up front rather than on the first request
+for _fields in (TODO_FIELDS, LIST_FIELDS):
+    projection(_fields)
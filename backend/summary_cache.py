@@ -0,0 +1,93 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import List, Optional
+# from . import models
+import models
+
+SUMMARY_CACHE_TTL = float(os.getenv("SUMMARY_CACHE_TTL", "300"))
+SUMMARY_CACHE_SIZE = int(os.getenv("SUMMARY_CACHE_SIZE", "128"))
+# Partial summaries of map-reduce chunks, keyed by the chunk's prompt hash.
+# They depend on nothing but the chunk, so writes don't invalidate them: a
+# long list whose map phase outlasts a request resumes from the chunks
+# already done, and after a write only the chunks that changed are redone.
+SUMMARY_PARTIAL_CACHE_SIZE = int(os.getenv("SUMMARY_PARTIAL_CACHE_SIZE", "1024"))
+
+
+def cache_key(todos: List[models.Todo], today: date) -> str:
+    """
+    Hashes the fields the summary prompt is built from, plus the current day.
+
+    The day is part of the key because "overdue" and "due today" change at
+    midnight even when no todo does.
+    """
+    digest = hashlib.sha256(today.isoformat().encode())
+    for t in todos:
+        due = t.due_date.isoformat() if t.due_date else ""
+        digest.update(f"\x1e{t.title}\x1f{due}\x1f{int(bool(t.completed))}".encode())
+    return digest.hexdigest()
+
+
+class SummaryCache:
+    """
+    Thread-safe LRU cache of generated summaries with a per-entry TTL.
+    """
+
+    def __init__(self, max_entries: int = SUMMARY_CACHE_SIZE, ttl: float = SUMMARY_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, summary: str):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, summary)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self):
+        """
+        Drops every entry; called after any write to todos.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+cache = SummaryCache()
+partials = SummaryCache(max_entries=SUMMARY_PARTIAL_CACHE_SIZE)
@@ -0,0 +1,195 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from datetime import date
+from typing import Awaitable, Callable, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Precompute the summary in the background after writes. Off by default:
+# each process that enables it pays for its own model calls, so with several
+# workers set SUMMARY_PRECOMPUTE=true on one of them only; the others compute
+# summaries on request. It only takes effect with SUMMARY_BACKEND=llm.
+# A refresh starts SUMMARY_DEBOUNCE seconds after the last write of a burst;
+# a summary older than SUMMARY_MAX_STALENESS seconds behind the latest write
+# is refreshed synchronously by the request instead of being served. A
+# refresh that fell back to another source is retried every
+# SUMMARY_RETRY_INTERVAL seconds.
+SUMMARY_PRECOMPUTE = os.getenv("SUMMARY_PRECOMPUTE", "false").lower() in ("1", "true", "yes")
+SUMMARY_DEBOUNCE = float(os.getenv("SUMMARY_DEBOUNCE", "3"))
+SUMMARY_MAX_STALENESS = float(os.getenv("SUMMARY_MAX_STALENESS", "60"))
+SUMMARY_RETRY_INTERVAL = float(os.getenv("SUMMARY_RETRY_INTERVAL", "30"))
+
+
+class Snapshot(NamedTuple):
+    summary: str
+    source: str
+    # Seconds since the summary was computed
+    age: float
+    # True unless the summary was computed by the preferred source from the
+    # data version and on the day the request sees
+    stale: bool
+
+
+class SummaryRefresher:
+    """
+    Holds the latest finished summary and recomputes it off the request path.
+
+    compute is an async callable returning (summary, source, version, day):
+    the data version and the day the summary was computed for. Writes in this
+    process call mark_dirty, from any thread, and the refresh runs on the
+    event loop passed to start, once per burst of writes. Writes made by
+    other processes and the date rolling over are noticed by current, which
+    compares the summary against the version and day of each request.
+    """
+
+    def __init__(
+        self,
+        compute: Callable[[], Awaitable[Tuple[str, str, int, date]]],
+        preferred_source: str = "llm",
+        debounce: float = SUMMARY_DEBOUNCE,
+        max_staleness: float = SUMMARY_MAX_STALENESS,
+        retry_interval: float = SUMMARY_RETRY_INTERVAL,
+    ):
+        self.compute = compute
+        self.preferred_source = preferred_source
+        self.debounce = debounce
+        self.max_staleness = max_staleness
+        self.retry_interval = retry_interval
+        self.refreshes = 0
+        self._summary = None
+        self._source = None
+        self._version = None
+        self._day = None
+        self._computed_at = 0.0
+        # Bumped by every write in this process; a refresh only clears
+        # _dirty_since when no write landed while it ran
+        self._writes = 0
+        self._dirty_since = None
+        self._lock = threading.Lock()
+        self._refresh_lock = asyncio.Lock()
+        self._loop = None
+        self._timer = None
+        self._task = None
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        # Warm up so the first request doesn't wait for the model
+        self._loop.call_soon(self._spawn)
+
+    async def stop(self):
+        if self._timer is not None:
+            self._timer.cancel()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except BaseException:
+                pass
+        self._loop = None
+
+    def mark_dirty(self):
+        with self._lock:
+            self._writes += 1
+            if self._dirty_since is None:
+                self._dirty_since = time.monotonic()
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._schedule)
+
+    def _schedule(self, delay: Optional[float] = None):
+        if self._loop is None:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = self._loop.call_later(self.debounce if delay is None else delay, self._spawn)
+
+    def _spawn(self):
+        self._timer = None
+        if self._task is None or self._task.done():
+            self._task = self._loop.create_task(self._refresh_in_background())
+        else:
+            # A refresh is still running and may predate the latest write
+            self._schedule()
+
+    async def _refresh_in_background(self):
+        try:
+            await self.refresh()
+        except Exception:
+            logger.exception("Background summary refresh failed")
+
+    def _is_current(self, version: int, day: date) -> bool:
+        return (
+            self._summary is not None
+            and self._version == version
+            and self._day == day
+            and self._source == self.preferred_source
+        )
+
+    async def refresh(self, version: Optional[int] = None, day: Optional[date] = None):
+        """
+        Recomputes the summary. Given the version and day a request reads,
+        returns at once when the summary is already current for them, as
+        after a concurrent caller's refresh.
+        """
+        async with self._refresh_lock:
+            with self._lock:
+                if version is not None and self._is_current(version, day):
+                    return
+                writes = self._writes
+            summary, source, computed_version, computed_day = await self.compute()
+            with self._lock:
+                self._summary, self._source = summary, source
+                self._version, self._day = computed_version, computed_day
+                self._computed_at = time.monotonic()
+                if writes == self._writes:
+                    self._dirty_since = None
+                self.refreshes += 1
+        if source != self.preferred_source:
+            # A fallback is only served until the preferred source answers again
+            self._schedule(self.retry_interval)
+
+    async def current(self, version: int, day: date) -> Snapshot:
+        """
+        Returns the latest summary for a request reading data `version` on
+        `day`. It is refreshed synchronously when there is none yet, when it
+        was computed on another day or when it has been behind the data for
+        over max_staleness; otherwise it is served at once, flagged stale if
+        it doesn't match, and refreshed in the background.
+        """
+        with self._lock:
+            missing = self._summary is None
+            behind = not missing and self._version != version
+            # A write by another process: nothing marked the summary dirty
+            noticed = behind and self._dirty_since is None
+            if noticed:
+                self._dirty_since = time.monotonic()
+            too_stale = (
+                self._dirty_since is not None
+                and time.monotonic() - self._dirty_since > self.max_staleness
+            )
+            new_day = not missing and self._day != day
+        if missing or new_day or too_stale:
+            await self.refresh(version, day)
+        elif noticed:
+            self._schedule()
+        with self._lock:
+            return Snapshot(
+                self._summary,
+                self._source,
+                time.monotonic() - self._computed_at,
+                not self._is_current(version, day),
+            )
+
+
+# Set while the background refresher is running
+refresher: Optional[SummaryRefresher] = None
+
+
+def notify_write():
+    """
+    Tells the background refresher that todos changed; a no-op when it isn't running.
+    """
+    if refresher is not None:
+        refresher.mark_dirty()
@@ -3,6 +3,8 @@ import os
 import tempfile
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from fastapi import FastAPI
 from fastapi.testclient import TestClient
 
 
@@ -10,11 +12,31 @@ import sys
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# Importing main connects to the app database and applies WAL to it; keep
+# that off the checked-in test.db
+os.environ.setdefault("SQLITE_DATABASE_PATH", os.path.join(tempfile.mkdtemp(), "app.db"))
+
 from main import app, get_db
+import async_api
+import summary_cache
+import row_cache
 from database import Base
 import models
 
 
+@pytest.fixture(autouse=True)
+def fresh_summary_cache(monkeypatch):
+    """Give every test empty summary and partial summary caches."""
+    monkeypatch.setattr(summary_cache, "cache", summary_cache.SummaryCache())
+    monkeypatch.setattr(summary_cache, "partials", summary_cache.SummaryCache())
+
+
+@pytest.fixture(autouse=True)
+def fresh_row_cache(monkeypatch):
+    """Give every test an empty row cache; ids repeat across test databases."""
+    monkeypatch.setattr(row_cache, "cache", row_cache.RowCache())
+
+
 @pytest.fixture
 def test_db():
     """Create a test database."""
@@ -46,6 +68,33 @@ def client(test_db):
     return TestClient(app)
 
 
+@pytest.fixture
+def async_client():
+    """Create a test client for the async CRUD endpoints on their own database."""
+    db_fd, db_path = tempfile.mkstemp()
+
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    engine.dispose()
+
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    async def override_get_db():
+        async with TestingAsyncSessionLocal() as db:
+            yield db
+
+    async_app = FastAPI()
+    async_app.include_router(async_api.router)
+    async_app.dependency_overrides[async_api.get_db] = override_get_db
+    with TestClient(async_app) as test_client:
+        yield test_client
+        test_client.portal.call(async_engine.dispose)
+
+    os.close(db_fd)
+    os.unlink(db_path)
+
+
 @pytest.fixture
 def sample_todo_data():
     """Sample todo data for testing."""
@@ -96,4 +145,4 @@ def multiple_created_todos(client, sample_todos_data):
     for todo_data in sample_todos_data:
         response = client.post("/todos/", json=todo_data)
         created_todos.append(response.json())
-    return created_todos
\ No newline at end of file
+    return created_todos
\ No newline at end of file
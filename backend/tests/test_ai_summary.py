@@ -1,5 +1,7 @@
+import asyncio
+import json
 import pytest
-from unittest.mock import patch, Mock
+from unittest.mock import patch, Mock, AsyncMock
 from datetime import datetime, date
 import sys
 import os
@@ -7,6 +9,7 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import ai_summary
+import fake_llm
 import models
 from fastapi.testclient import TestClient
 
@@ -272,7 +275,7 @@ class TestAISummaryIntegration:
         # Even if there's an error, we should get some response
         assert len(summary) > 0
 
-    @patch('ai_summary.client.chat.completions.create')
+    @patch('ai_summary.async_client.chat.completions.create', new_callable=AsyncMock)
     def test_summary_endpoint_with_mocked_ai(self, mock_openai, client, multiple_created_todos):
         """Test summary endpoint with mocked AI response."""
         mock_response = Mock()
@@ -284,4 +287,405 @@ class TestAISummaryIntegration:
 
         assert response.status_code == 200
         assert response.json() == "Mocked AI summary response"
-        mock_openai.assert_called_once()
\ No newline at end of file
+        mock_openai.assert_called_once()
+
+
+class TestSummaryEndpointCache:
+    """Test caching of summaries behind the endpoint."""
+
+    def mock_response(self, content):
+        response = Mock()
+        response.choices = [Mock()]
+        response.choices[0].message.content = content
+        return response
+
+    @patch('ai_summary.async_client.chat.completions.create', new_callable=AsyncMock)
+    def test_repeat_request_served_from_cache(self, mock_openai, client, multiple_created_todos):
+        """Test that an unchanged todo list does not call the model twice."""
+        mock_openai.return_value = self.mock_response("Cached summary")
+
+        first = client.get("/todos/summary")
+        second = client.get("/todos/summary")
+
+        assert first.headers["X-Summary-Cache"] == "miss"
+        assert second.headers["X-Summary-Cache"] == "hit"
+        assert second.json() == "Cached summary"
+        mock_openai.assert_called_once()
+
+    @patch('ai_summary.async_client.chat.completions.create', new_callable=AsyncMock)
+    def test_write_invalidates_cache(self, mock_openai, client, created_todo):
+        """Test that a write forces the next summary to be regenerated."""
+        mock_openai.return_value = self.mock_response("Summary")
+        client.get("/todos/summary")
+
+        client.patch(f"/todos/{created_todo['id']}", json={"completed": True})
+        response = client.get("/todos/summary")
+
+        assert response.headers["X-Summary-Cache"] == "miss"
+        assert mock_openai.call_count == 2
+
+    @patch('ai_summary.async_client.chat.completions.create', new_callable=AsyncMock)
+    def test_errors_are_not_cached(self, mock_openai, client, created_todo):
+        """Test that a failed generation is retried on the next request."""
+        mock_openai.side_effect = Exception("API Error")
+        client.get("/todos/summary")
+        client.get("/todos/summary")
+
+        assert client.get("/cache/stats").json()["summary"]["hits"] == 0
+
+    def test_cache_stats_endpoint(self, client):
+        """Test that hit and miss counters are reported."""
+        client.get("/todos/summary")
+        client.get("/todos/summary")
+
+        stats = client.get("/cache/stats").json()["summary"]
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+
+
+
+class TestAsyncSummaryCompletion:
+    """Test the async completion path used by the summary endpoint."""
+
+    def mock_response(self, content):
+        response = Mock()
+        response.choices = [Mock()]
+        response.choices[0].message.content = content
+        return response
+
+    def test_concurrent_identical_prompts_coalesce(self):
+        """Test that concurrent requests for one prompt share a completion."""
+        async def slow_completion(**kwargs):
+            await asyncio.sleep(0.05)
+            return self.mock_response("Shared summary")
+
+        async def run():
+            with patch('ai_summary.async_client.chat.completions.create', side_effect=slow_completion) as mock_create:
+                results = await asyncio.gather(*[ai_summary.complete("same prompt") for _ in range(10)])
+            return results, mock_create.call_count
+
+        results, calls = asyncio.run(run())
+
+        assert results == ["Shared summary"] * 10
+        assert calls == 1
+        assert ai_summary._in_flight == {}
+
+    def test_different_prompts_not_coalesced(self):
+        """Test that distinct prompts each get their own completion."""
+        async def run():
+            with patch('ai_summary.async_client.chat.completions.create', new_callable=AsyncMock) as mock_create:
+                mock_create.return_value = self.mock_response("Summary")
+                await asyncio.gather(ai_summary.complete("prompt a"), ai_summary.complete("prompt b"))
+            return mock_create.call_count
+
+        assert asyncio.run(run()) == 2
+
+    def test_errors_reach_every_waiter(self):
+        """Test that a failed shared completion fails all coalesced callers."""
+        async def failing(**kwargs):
+            await asyncio.sleep(0.01)
+            raise RuntimeError("API Error")
+
+        async def run():
+            with patch('ai_summary.async_client.chat.completions.create', side_effect=failing):
+                return await asyncio.gather(*[ai_summary.complete("p") for _ in range(3)], return_exceptions=True)
+
+        results = asyncio.run(run())
+
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+    def test_summarize_error_returns_none(self, caplog):
+        """Test that API errors are logged and return None for the caller to fall back."""
+        todo = Mock(spec=models.Todo)
+        todo.title = "Task"
+        todo.completed = False
+        todo.due_date = None
+
+        with patch('ai_summary.async_client.chat.completions.create', new_callable=AsyncMock) as mock_create:
+            mock_create.side_effect = Exception("API Error")
+            summary = asyncio.run(ai_summary.summarize(lambda: ai_summary.prepare_prompt([todo])))
+
+        assert summary is None
+        assert "Summarizing with the model failed" in caplog.text
+
+    def test_client_timeouts_configured(self):
+        """Test that explicit connect and read timeouts are set."""
+        timeout = ai_summary.async_client.timeout
+
+        assert timeout.connect == ai_summary.LLM_CONNECT_TIMEOUT
+        assert timeout.read == ai_summary.LLM_READ_TIMEOUT
+
+
+def parse_sse(body):
+    """Split a text/event-stream body into (event, data) pairs."""
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+class TestSummaryStream:
+    """Test the Server-Sent Events summary endpoint."""
+
+    @pytest.fixture
+    def fake_model(self, monkeypatch):
+        model = fake_llm.FakeAsyncOpenAI(reply="You have three tasks. Two are still pending.")
+        monkeypatch.setattr(ai_summary, "async_client", model)
+        return model
+
+    def test_stream_emits_token_deltas(self, client, multiple_created_todos, fake_model):
+        """Test that each token arrives as its own delta event."""
+        response = client.get("/todos/summary/stream")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = parse_sse(response.text)
+        deltas = [data["content"] for event, data in events if event == "delta"]
+        assert len(deltas) == 8
+        assert "".join(deltas) == fake_model.reply
+
+    def test_stream_final_event_has_usage(self, client, multiple_created_todos, fake_model):
+        """Test that the final event carries usage and cache metadata."""
+        event, data = parse_sse(client.get("/todos/summary/stream").text)[-1]
+
+        assert event == "done"
+        assert data["cached"] is False
+        assert data["usage"]["completion_tokens"] == 8
+        assert data["usage"]["total_tokens"] == data["usage"]["prompt_tokens"] + 8
+
+    def test_streamed_summary_is_cached(self, client, multiple_created_todos, fake_model):
+        """Test that a finished stream fills the cache for both endpoints."""
+        client.get("/todos/summary/stream")
+
+        events = parse_sse(client.get("/todos/summary/stream").text)
+        summary = client.get("/todos/summary")
+
+        assert events[0] == ("delta", {"content": fake_model.reply})
+        assert events[-1][1]["cached"] is True
+        assert summary.json() == fake_model.reply
+        assert fake_model.calls == 1
+
+    def test_stream_with_no_todos(self, client, fake_model):
+        """Test that an empty list streams the fixed message without calling the model."""
+        events = parse_sse(client.get("/todos/summary/stream").text)
+
+        assert events[0] == ("delta", {"content": ai_summary.NO_TODOS_MESSAGE})
+        assert fake_model.calls == 0
+
+    def test_stream_error_falls_back_to_local(self, client, created_todo, monkeypatch):
+        """Test that a model failure before any token streams the local summary."""
+        failing = Mock()
+        failing.chat.completions.create = AsyncMock(side_effect=Exception("API Error"))
+        monkeypatch.setattr(ai_summary, "async_client", failing)
+
+        events = parse_sse(client.get("/todos/summary/stream").text)
+
+        assert [event for event, _ in events] == ["delta", "done"]
+        assert "Test Todo" in events[0][1]["content"]
+        assert events[-1][1]["source"] == "local"
+
+    def test_stream_error_event(self, client, created_todo, monkeypatch):
+        """Test that a model failure mid-stream ends it with an error event."""
+        async def broken_stream():
+            yield Mock(choices=[Mock(delta=Mock(content="You have"))], usage=None)
+            raise Exception("API Error")
+
+        failing = Mock()
+        failing.chat.completions.create = AsyncMock(return_value=broken_stream())
+        monkeypatch.setattr(ai_summary, "async_client", failing)
+
+        events = parse_sse(client.get("/todos/summary/stream").text)
+
+        assert events == [("delta", {"content": "You have"}), ("error", {"message": ai_summary.ERROR_MESSAGE})]
+
+
+class TestMapReduceSummary:
+    """Test chunked summarization of large todo lists."""
+
+    def create_mock_todos(self, count):
+        todos = []
+        for i in range(count):
+            todo = Mock(spec=models.Todo)
+            todo.title = f"Task number {i}"
+            todo.completed = i % 2 == 0
+            todo.due_date = datetime(2025, 1, 1 + i % 28)
+            todos.append(todo)
+        return todos
+
+    @pytest.fixture
+    def fake_model(self, monkeypatch):
+        model = fake_llm.FakeAsyncOpenAI(reply="Partial summary.")
+        monkeypatch.setattr(ai_summary, "async_client", model)
+        return model
+
+    def test_chunks_respect_token_budget(self):
+        """Test that every chunk stays within the configured token size."""
+        todos = self.create_mock_todos(100)
+
+        chunks = ai_summary.chunk_by_tokens(todos, ai_summary.todo_line, 200)
+
+        assert sum(len(chunk) for chunk in chunks) == 100
+        assert len(chunks) > 1
+        for chunk in chunks:
+            assert sum(ai_summary.estimate_tokens(ai_summary.todo_line(t)) for t in chunk) <= 200
+
+    def test_small_list_uses_single_prompt(self, fake_model):
+        """Test that lists within the budget make exactly one call."""
+        todos = self.create_mock_todos(3)
+
+        asyncio.run(ai_summary.summarize(lambda: ai_summary.prepare_prompt(todos)))
+
+        assert fake_model.calls == 1
+
+    def test_large_list_maps_then_reduces(self, fake_model, monkeypatch):
+        """Test that an oversized list is summarized per chunk and then combined."""
+        monkeypatch.setattr(ai_summary, "SUMMARY_TOKEN_BUDGET", 500)
+        monkeypatch.setattr(ai_summary, "SUMMARY_CHUNK_TOKENS", 200)
+        todos = self.create_mock_todos(100)
+        chunks = ai_summary.chunk_by_tokens(todos, ai_summary.todo_line, 200)
+
+        with patch.object(fake_model.chat.completions, "create", wraps=fake_model.chat.completions.create) as create:
+            summary = asyncio.run(ai_summary.summarize(lambda: ai_summary.prepare_prompt(todos)))
+
+        prompts = [call.kwargs["messages"][1]["content"] for call in create.call_args_list]
+        assert summary == "Partial summary."
+        assert len(prompts) == len(chunks) + 1
+        assert "partial summaries" in prompts[-1]
+        assert all(ai_summary.estimate_tokens(p) <= 500 for p in prompts)
+
+    def test_map_concurrency_is_bounded(self, monkeypatch):
+        """Test that no more than SUMMARY_MAP_CONCURRENCY chunks run at once."""
+        monkeypatch.setattr(ai_summary, "SUMMARY_TOKEN_BUDGET", 500)
+        monkeypatch.setattr(ai_summary, "SUMMARY_CHUNK_TOKENS", 100)
+        monkeypatch.setattr(ai_summary, "SUMMARY_MAP_CONCURRENCY", 2)
+        running = {"now": 0, "max": 0}
+
+        async def tracked(**kwargs):
+            running["now"] += 1
+            running["max"] = max(running["max"], running["now"])
+            await asyncio.sleep(0.01)
+            running["now"] -= 1
+            response = Mock()
+            response.choices = [Mock()]
+            response.choices[0].message.content = kwargs["messages"][1]["content"][-20:]
+            return response
+
+        with patch('ai_summary.async_client.chat.completions.create', side_effect=tracked):
+            todos = self.create_mock_todos(60)
+            asyncio.run(ai_summary.summarize(lambda: ai_summary.prepare_prompt(todos)))
+
+        assert running["max"] == 2
+
+    def test_map_partials_survive_a_timeout(self, fake_model, monkeypatch):
+        """Test that chunks summarized before a timeout are reused by the next call."""
+        monkeypatch.setattr(ai_summary, "SUMMARY_TOKEN_BUDGET", 500)
+        monkeypatch.setattr(ai_summary, "SUMMARY_CHUNK_TOKENS", 200)
+        monkeypatch.setattr(ai_summary, "SUMMARY_MAP_CONCURRENCY", 100)
+        monkeypatch.setattr(ai_summary, "LLM_SUMMARY_TIMEOUT", 0.05)
+        fake_model.delay = 0.05
+        todos = self.create_mock_todos(100)
+        chunks = ai_summary.chunk_by_tokens(todos, ai_summary.todo_line, 200)
+
+        async def run():
+            first = await ai_summary.summarize(lambda: ai_summary.prepare_prompt(todos))
+            # The map calls carry on after the timeout
+            await asyncio.sleep(0.2)
+            calls = fake_model.calls
+            second = await ai_summary.summarize(lambda: ai_summary.prepare_prompt(todos), bounded=False)
+            return first, calls, second
+
+        first, calls, second = asyncio.run(run())
+
+        assert first is None
+        assert calls == len(chunks)
+        assert second == "Partial summary."
+        assert fake_model.calls == len(chunks) + 1
+
+    def test_unbounded_summary_outlasts_timeout(self, fake_model, monkeypatch):
+        """Test that bounded=False, as used by the background refresher, ignores LLM_SUMMARY_TIMEOUT."""
+        monkeypatch.setattr(ai_summary, "LLM_SUMMARY_TIMEOUT", 0.01)
+        fake_model.delay = 0.05
+        todos = self.create_mock_todos(3)
+
+        summary = asyncio.run(ai_summary.summarize(lambda: ai_summary.prepare_prompt(todos), bounded=False))
+
+        assert summary == "Partial summary."
+
+
+class TestCompactPrompt:
+    """Test the token-budgeted prompt built from bucket counts."""
+
+    COUNTS = {"overdue": 12, "today": 1, "upcoming": 40, "undated": 3, "completed": 7}
+
+    def titles(self, prefix, count):
+        return [(f"{prefix} {i}", datetime(2025, 6, 1 + i)) for i in range(count)]
+
+    def test_counts_and_titles(self):
+        """Test that the prompt carries every count and the example titles."""
+        prompt = ai_summary.build_compact_prompt(
+            self.COUNTS, self.titles("Late", 2), self.titles("Soon", 2), date(2025, 6, 15), max_tokens=1000
+        )
+
+        assert "Today is 2025-06-15" in prompt
+        assert "12 overdue, 1 due today, 40 upcoming, 3 without a due date, 7 completed" in prompt
+        assert "- Late 0 (Due: 2025-06-01)" in prompt
+        assert "- Soon 1 (Due: 2025-06-02)" in prompt
+
+    def test_trimmed_to_budget(self):
+        """Test that titles are dropped until the prompt fits the token budget."""
+        prompt = ai_summary.build_compact_prompt(
+            self.COUNTS, self.titles("Late", 5), self.titles("Soon", 5), date(2025, 6, 15), max_tokens=140
+        )
+
+        assert ai_summary.estimate_tokens(prompt) <= 140
+        assert "Late 0" in prompt
+        assert "Late 4" not in prompt
+        assert "40 upcoming" in prompt
+
+    def test_long_titles_are_shortened(self):
+        """Test that one huge title cannot take the whole budget."""
+        prompt = ai_summary.build_compact_prompt(
+            self.COUNTS, [("x" * 5000, datetime(2025, 6, 1))], [], date(2025, 6, 15), max_tokens=1000
+        )
+
+        assert "x" * ai_summary.COMPACT_TITLE_CHARS not in prompt
+        assert len(prompt) < 1000
+
+    def test_endpoint_uses_compact_prompt(self, client, monkeypatch):
+        """Test that the endpoint prompt stays small however many todos exist."""
+        model = fake_llm.FakeAsyncOpenAI(reply="Summary")
+        monkeypatch.setattr(ai_summary, "async_client", model)
+        monkeypatch.setattr(ai_summary, "prompt_stats", ai_summary.PromptStats())
+        todos = [{"title": f"Todo {i}", "due_date": f"2030-01-{1 + i % 28:02d}T00:00:00"} for i in range(200)]
+        client.post("/todos/bulk", json=todos)
+
+        with patch.object(model.chat.completions, "create", wraps=model.chat.completions.create) as create:
+            assert client.get("/todos/summary").json() == "Summary"
+
+        prompt = create.call_args.kwargs["messages"][1]["content"]
+        assert "200 upcoming" in prompt
+        assert prompt.count("\n- ") == ai_summary.SUMMARY_TOP_N
+        assert ai_summary.estimate_tokens(prompt) <= ai_summary.SUMMARY_PROMPT_TOKENS
+
+    def test_summary_stats_endpoint(self, client, created_todo, monkeypatch):
+        """Test that prompt sizes and reported token usage are exposed."""
+        monkeypatch.setattr(ai_summary, "async_client", fake_llm.FakeAsyncOpenAI(reply="Two words"))
+        monkeypatch.setattr(ai_summary, "prompt_stats", ai_summary.PromptStats())
+        client.get("/todos/summary")
+
+        stats = client.get("/todos/summary/stats").json()
+
+        assert stats["mode"] == "compact"
+        assert stats["prompts"] == 1
+        assert stats["prompt_chars"] > 0
+        assert stats["prompt_tokens"] > 0
+        assert stats["completion_tokens"] == 2
+
+    def test_full_prompt_mode(self, client, multiple_created_todos, monkeypatch):
+        """Test that SUMMARY_PROMPT=full still lists every todo."""
+        monkeypatch.setattr(ai_summary, "SUMMARY_PROMPT", "full")
+        model = fake_llm.FakeAsyncOpenAI()
+        monkeypatch.setattr(ai_summary, "async_client", model)
+
+        assert client.get("/todos/summary").json() == "You have 3 tasks on your list. Keep up the good work!"
@@ -0,0 +1,69 @@
+import pytest
+
+
+class TestAsyncTodosCRUD:
+    """Test the async CRUD endpoints used when DB_MODE=async."""
+
+    def test_create_and_get_todo(self, async_client, sample_todo_data):
+        """Test creating a todo and reading it back."""
+        response = async_client.post("/todos/", json=sample_todo_data)
+
+        assert response.status_code == 200
+        created = response.json()
+        assert created["title"] == sample_todo_data["title"]
+        assert "id" in created
+        assert "created_at" in created
+
+        get_response = async_client.get(f"/todos/{created['id']}")
+        assert get_response.status_code == 200
+        assert get_response.json() == created
+
+    def test_list_todos_paginated(self, async_client):
+        """Test that the async list endpoint paginates like the sync one."""
+        for i in range(3):
+            async_client.post("/todos/", json={"title": f"Todo {i}"})
+
+        first = async_client.get("/todos/?limit=2")
+        assert len(first.json()) == 2
+        cursor = first.headers["X-Next-Cursor"]
+
+        second = async_client.get(f"/todos/?limit=2&cursor={cursor}")
+        assert [todo["title"] for todo in second.json()] == ["Todo 2"]
+        assert "X-Next-Cursor" not in second.headers
+
+    def test_update_todo(self, async_client, sample_todo_data):
+        """Test updating a todo."""
+        todo_id = async_client.post("/todos/", json=sample_todo_data).json()["id"]
+
+        response = async_client.put(f"/todos/{todo_id}", json={"title": "Updated", "completed": True})
+
+        assert response.status_code == 200
+        assert response.json()["title"] == "Updated"
+        assert response.json()["completed"] is True
+
+    def test_delete_todo(self, async_client, sample_todo_data):
+        """Test deleting a todo."""
+        todo_id = async_client.post("/todos/", json=sample_todo_data).json()["id"]
+
+        response = async_client.delete(f"/todos/{todo_id}")
+
+        assert response.status_code == 200
+        assert response.json()["id"] == todo_id
+        assert async_client.get(f"/todos/{todo_id}").status_code == 404
+
+    def test_not_found(self, async_client):
+        """Test 404 handling for missing todos."""
+        assert async_client.get("/todos/999").json()["detail"] == "Todo not found"
+        assert async_client.put("/todos/999", json={"title": "x"}).status_code == 404
+        assert async_client.delete("/todos/999").status_code == 404
+
+    def test_patch_todo(self, async_client, sample_todo_data):
+        """Test partial updates on the async path."""
+        created = async_client.post("/todos/", json=sample_todo_data).json()
+
+        response = async_client.patch(f"/todos/{created['id']}", json={"completed": True})
+
+        assert response.status_code == 200
+        assert response.json()["completed"] is True
+        assert response.json()["title"] == created["title"]
+        assert async_client.patch("/todos/999", json={"completed": True}).status_code == 404
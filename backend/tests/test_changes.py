@@ -0,0 +1,109 @@
+import pytest
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import changes
+
+
+@pytest.fixture
+def db(test_db):
+    session = test_db()
+    yield session
+    session.close()
+
+
+def compact(db, retention):
+    removed = changes.compact(db, retention)
+    db.commit()
+    return removed
+
+
+class TestChangeFeed:
+    """Test GET /todos/changes."""
+
+    def test_inserts_since_zero(self, client, multiple_created_todos):
+        """Test that a new client gets every todo from since=0."""
+        page = client.get("/todos/changes?since=0").json()
+
+        assert [c["id"] for c in page["changes"]] == [t["id"] for t in multiple_created_todos]
+        assert all(not c["deleted"] for c in page["changes"])
+        assert page["changes"][0]["todo"]["title"] == multiple_created_todos[0]["title"]
+        assert page["has_more"] is False
+
+    def test_only_deltas(self, client, multiple_created_todos):
+        """Test that only todos written after since are returned."""
+        since = client.get("/todos/changes").json()["next_since"]
+        client.patch(f"/todos/{multiple_created_todos[1]['id']}", json={"completed": True})
+
+        page = client.get(f"/todos/changes?since={since}").json()
+
+        assert len(page["changes"]) == 1
+        assert page["changes"][0]["todo"]["completed"] is True
+        assert client.get(f"/todos/changes?since={page['next_since']}").json()["changes"] == []
+
+    def test_tombstone(self, client, created_todo):
+        """Test that a deleted todo shows up as a tombstone."""
+        since = client.get("/todos/changes").json()["next_since"]
+        client.delete(f"/todos/{created_todo['id']}")
+
+        change = client.get(f"/todos/changes?since={since}").json()["changes"][0]
+
+        assert change["id"] == created_todo["id"]
+        assert change["deleted"] is True
+        assert change["todo"] is None
+
+    def test_latest_change_per_todo(self, client, created_todo):
+        """Test that repeated updates of one todo come back as one entry."""
+        since = client.get("/todos/changes").json()["next_since"]
+        for title in ("One", "Two", "Three"):
+            client.patch(f"/todos/{created_todo['id']}", json={"title": title})
+
+        page = client.get(f"/todos/changes?since={since}").json()
+
+        assert [c["todo"]["title"] for c in page["changes"]] == ["Three"]
+
+    def test_paginated(self, client):
+        """Test paging through the feed with next_since."""
+        client.post("/todos/bulk", json=[{"title": f"Todo {i}"} for i in range(5)])
+
+        first = client.get("/todos/changes?since=0&limit=3").json()
+        second = client.get(f"/todos/changes?since={first['next_since']}&limit=3").json()
+
+        assert first["has_more"] is True
+        assert second["has_more"] is False
+        assert len(first["changes"]) + len(second["changes"]) == 5
+
+
+class TestChangeCompaction:
+    """Test compaction of the changelog."""
+
+    def test_superseded_entries_removed_losslessly(self, client, db, created_todo):
+        """Test that dropping superseded entries keeps every cursor valid."""
+        client.patch(f"/todos/{created_todo['id']}", json={"title": "Renamed"})
+
+        assert compact(db, retention=3600) == 1
+        page = client.get("/todos/changes?since=0").json()
+        assert [c["todo"]["title"] for c in page["changes"]] == ["Renamed"]
+
+    def test_old_cursor_requires_resync(self, client, db, multiple_created_todos):
+        """Test that a cursor behind the compacted range gets 410 and the head."""
+        client.delete(f"/todos/{multiple_created_todos[0]['id']}")
+        compact(db, retention=-1)
+
+        response = client.get("/todos/changes?since=0")
+
+        assert response.status_code == 410
+        head = int(response.headers["X-Changes-Head"])
+        assert client.get(f"/todos/changes?since={head}").json()["changes"] == []
+
+    def test_feed_resumes_after_compaction(self, client, db, created_todo):
+        """Test that changes after the horizon are still served."""
+        compact(db, retention=-1)
+        head = client.get("/todos/changes?since=0").headers["X-Changes-Head"]
+        client.patch(f"/todos/{created_todo['id']}", json={"completed": True})
+
+        page = client.get(f"/todos/changes?since={head}").json()
+
+        assert [c["id"] for c in page["changes"]] == [created_todo["id"]]
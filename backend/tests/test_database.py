@@ -0,0 +1,130 @@
+import pytest
+import os
+import tempfile
+from sqlalchemy import create_engine, event
+
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+
+@pytest.fixture
+def profiled_engine():
+    """Create a file-backed engine with the SQLite profile applied."""
+    db_dir = tempfile.mkdtemp()
+    engine = create_engine(f"sqlite:///{os.path.join(db_dir, 'profile.db')}")
+    event.listen(engine, "connect", database.set_sqlite_pragmas)
+    yield engine
+    engine.dispose()
+    for name in os.listdir(db_dir):
+        os.unlink(os.path.join(db_dir, name))
+    os.rmdir(db_dir)
+
+
+class TestSQLiteProfile:
+    """Test the per-connection SQLite performance profile."""
+
+    def test_default_profile_applied(self, profiled_engine):
+        """Test that every configured pragma takes effect on new connections."""
+        settings = database.sqlite_settings(profiled_engine)
+
+        assert settings["journal_mode"] == "wal"
+        assert settings["synchronous"] == 1  # NORMAL
+        assert settings["busy_timeout"] == database.SQLITE_PRAGMAS["busy_timeout"]
+        assert settings["cache_size"] == database.SQLITE_PRAGMAS["cache_size"]
+        assert settings["temp_store"] == 2  # MEMORY
+
+    def test_settings_cover_every_pragma(self, profiled_engine):
+        """Test that the startup report lists every configured pragma."""
+        settings = database.sqlite_settings(profiled_engine)
+
+        assert set(settings) == set(database.SQLITE_PRAGMAS)
+
+    def test_profile_is_configurable(self, profiled_engine, monkeypatch):
+        """Test that overriding a pragma value changes the effective setting."""
+        monkeypatch.setitem(database.SQLITE_PRAGMAS, "busy_timeout", 1234)
+        monkeypatch.setitem(database.SQLITE_PRAGMAS, "synchronous", "FULL")
+
+        settings = database.sqlite_settings(profiled_engine)
+
+        assert settings["busy_timeout"] == 1234
+        assert settings["synchronous"] == 2  # FULL
+
+
+class TestQueryInstrumentation:
+    """Test per-request query stats, the slow-query log and the query budget."""
+
+    def test_fingerprint_normalizes_literals(self):
+        """Test that statements differing only in values share a fingerprint."""
+        a = database.fingerprint("SELECT * FROM todos WHERE id IN (?, ?, ?) AND title = 'a'")
+        b = database.fingerprint("SELECT *  FROM todos\n WHERE id IN (?) AND title = 'it''s'")
+
+        assert a == b == "SELECT * FROM todos WHERE id IN (?) AND title = ?"
+
+    def test_statements_recorded_in_context(self, profiled_engine):
+        """Test that statements run while stats are set are counted."""
+        stats = database.QueryStats()
+        token = database.query_stats.set(stats)
+        try:
+            with profiled_engine.connect() as conn:
+                for i in range(3):
+                    conn.exec_driver_sql("SELECT ?", (i,))
+        finally:
+            database.query_stats.reset(token)
+
+        assert stats.count == 3
+        assert stats.fingerprints["SELECT ?"] == 3
+        assert stats.duration > 0
+
+    def test_statement_hooks_share_the_timing(self, profiled_engine, monkeypatch):
+        """Test that hooks get the same duration the request stats record."""
+        observed = []
+        monkeypatch.setattr(database, "statement_hooks", [lambda statement, duration: observed.append(duration)])
+        stats = database.QueryStats()
+        token = database.query_stats.set(stats)
+        try:
+            with profiled_engine.connect() as conn:
+                conn.exec_driver_sql("SELECT 1")
+                started = conn.info["query_started"]
+        finally:
+            database.query_stats.reset(token)
+
+        assert observed == [stats.duration]
+        assert started == []
+
+    def test_slow_query_logged_with_plan(self, profiled_engine, monkeypatch, caplog):
+        """Test that slow statements are logged with their EXPLAIN QUERY PLAN."""
+        monkeypatch.setattr(database, "QUERY_SLOW_MS", 0.000001)
+        with profiled_engine.begin() as conn:
+            conn.exec_driver_sql("CREATE TABLE t (id INTEGER PRIMARY KEY, name TEXT)")
+            caplog.clear()
+            conn.exec_driver_sql("SELECT name FROM t WHERE id = ?", (1,))
+
+        messages = [r.getMessage() for r in caplog.records if r.name == "database"]
+        assert any("Slow query" in m and "SEARCH t USING INTEGER PRIMARY KEY" in m for m in messages)
+
+    def test_debug_headers(self, client, created_todo, monkeypatch):
+        """Test that responses report the request's query count and time."""
+        monkeypatch.setattr(database, "QUERY_DEBUG_HEADERS", True)
+
+        response = client.get(f"/todos/{created_todo['id']}")
+
+        assert int(response.headers["X-DB-Queries"]) > 0
+        assert float(response.headers["X-DB-Time"]) >= 0
+        assert "X-DB-Over-Budget" not in response.headers
+
+    def test_headers_off_by_default(self, client):
+        """Test that the debug headers are opt-in."""
+        assert "X-DB-Queries" not in client.get("/todos/").headers
+
+    def test_over_budget_flagged(self, client, created_todo, monkeypatch, caplog):
+        """Test that requests over the query budget are flagged and logged."""
+        monkeypatch.setattr(database, "QUERY_DEBUG_HEADERS", True)
+        monkeypatch.setattr(database, "QUERY_BUDGET", 1)
+
+        response = client.get(f"/todos/{created_todo['id']}")
+
+        assert response.headers["X-DB-Over-Budget"] == "true"
+        assert any("queries (budget 1)" in r.getMessage() for r in caplog.records)
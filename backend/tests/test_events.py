@@ -0,0 +1,158 @@
+import asyncio
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import changes
+import events
+
+
+class FakeChangelog:
+    """Stands in for the changelog; every write appends one change."""
+
+    def __init__(self):
+        self.seq = 0
+        self.fetches = 0
+        self.horizon = 0
+
+    def write(self):
+        self.seq += 1
+
+    async def fetch(self, since):
+        self.fetches += 1
+        if since is None:
+            return [], self.seq
+        if since < self.horizon:
+            raise changes.ResyncRequired(self.seq)
+        return [{"seq": s, "id": s} for s in range(since + 1, self.seq + 1)], self.seq
+
+
+def parse(message):
+    fields = dict(line.split(": ", 1) for line in message.strip().splitlines())
+    return fields["event"], json.loads(fields["data"])
+
+
+async def started(changelog, **kwargs):
+    broadcaster = events.Broadcaster(changelog.fetch, poll_interval=0, **kwargs)
+    await broadcaster.start()
+    return broadcaster
+
+
+class TestBroadcaster:
+    """Test fan-out of todo changes to event stream subscribers."""
+
+    def test_writes_in_window_are_batched(self):
+        """Test that writes within the batch window arrive as one event."""
+        changelog = FakeChangelog()
+
+        async def scenario():
+            broadcaster = await started(changelog, batch_window=0.05)
+            subscriber = broadcaster.subscribe()
+            for _ in range(3):
+                changelog.write()
+                broadcaster.notify()
+            message = await asyncio.wait_for(subscriber.queue.get(), 1)
+            await broadcaster.stop()
+            return message, broadcaster.published
+
+        message, published = asyncio.run(scenario())
+
+        event, data = parse(message)
+        assert event == "changes"
+        assert [c["seq"] for c in data["changes"]] == [1, 2, 3]
+        assert data["next_since"] == 3
+        assert published == 1
+
+    def test_every_subscriber_gets_the_event(self):
+        """Test that one formatted event reaches many subscribers."""
+        changelog = FakeChangelog()
+
+        async def scenario():
+            broadcaster = await started(changelog, batch_window=0.01)
+            subscribers = [broadcaster.subscribe() for _ in range(1000)]
+            changelog.write()
+            broadcaster.notify()
+            await asyncio.sleep(0.1)
+            await broadcaster.stop()
+            return subscribers
+
+        subscribers = asyncio.run(scenario())
+
+        assert all(s.queue.qsize() >= 1 for s in subscribers)
+        assert changelog.fetches == 2
+
+    def test_slow_consumer_dropped(self):
+        """Test that a subscriber with a full queue is cut off, not waited for."""
+        changelog = FakeChangelog()
+
+        async def scenario():
+            broadcaster = await started(changelog, queue_size=2)
+            subscriber = broadcaster.subscribe()
+            for _ in range(3):
+                broadcaster.publish("event: changes\ndata: {}\n\n")
+            messages = [m async for m in broadcaster.stream(subscriber)]
+            return broadcaster, messages
+
+        broadcaster, messages = asyncio.run(scenario())
+
+        assert [parse(m)[0] for m in messages] == ["dropped"]
+        assert broadcaster.dropped == 1
+        assert broadcaster.subscribers == 0
+
+    def test_reconnect_replays_missed_changes(self):
+        """Test that Last-Event-ID replays the changes after it."""
+        changelog = FakeChangelog()
+        for _ in range(5):
+            changelog.write()
+
+        async def scenario():
+            broadcaster = await started(changelog)
+            stream = broadcaster.stream(broadcaster.subscribe(), last_event_id=3)
+            message = await stream.__anext__()
+            await stream.aclose()
+            return broadcaster, message
+
+        broadcaster, message = asyncio.run(scenario())
+
+        assert [c["seq"] for c in parse(message)[1]["changes"]] == [4, 5]
+        assert message.startswith("id: 5\n")
+        assert broadcaster.subscribers == 0
+
+    def test_reconnect_after_compaction_asks_for_resync(self):
+        """Test that a Last-Event-ID behind the horizon gets a resync event."""
+        changelog = FakeChangelog()
+        for _ in range(5):
+            changelog.write()
+        changelog.horizon = 4
+
+        async def scenario():
+            broadcaster = await started(changelog)
+            stream = broadcaster.stream(broadcaster.subscribe(), last_event_id=1)
+            message = await stream.__anext__()
+            await stream.aclose()
+            return message
+
+        assert parse(asyncio.run(scenario())) == ("resync", {"head": 5})
+
+    def test_idle_stream_sends_keep_alive(self):
+        """Test that an idle stream emits comments to keep proxies from closing it."""
+        changelog = FakeChangelog()
+
+        async def scenario():
+            broadcaster = await started(changelog)
+            stream = broadcaster.stream(broadcaster.subscribe(), heartbeat=0.01)
+            message = await stream.__anext__()
+            await stream.aclose()
+            return message
+
+        assert asyncio.run(scenario()) == ": keep-alive\n\n"
+
+
+class TestEventsEndpoint:
+    """Test GET /todos/events outside the app lifespan."""
+
+    def test_unavailable_without_broadcaster(self, client):
+        """Test that the endpoint reports 503 when the broadcaster isn't running."""
+        assert client.get("/todos/events").status_code == 503
@@ -0,0 +1,178 @@
+import asyncio
+import pytest
+from datetime import date, datetime
+from unittest.mock import AsyncMock, patch
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ai_summary
+import fake_llm
+import local_summary
+import models
+
+TODAY = date(2025, 6, 15)
+
+
+@pytest.fixture
+def db(test_db):
+    session = test_db()
+    yield session
+    session.close()
+
+
+def add(db, title, completed=False, due_date=None):
+    db.add(models.Todo(title=title, completed=completed, due_date=due_date))
+    db.commit()
+
+
+class TestBucketCounts:
+    """Test the single GROUP BY behind the local summary."""
+
+    def test_empty_table(self, db):
+        """Test that an empty table has no buckets."""
+        assert local_summary.bucket_counts(db, TODAY) == {}
+
+    def test_buckets(self, db):
+        """Test that todos land in the right bucket with the earliest title."""
+        add(db, "Old report", due_date=datetime(2025, 6, 1))
+        add(db, "Older invoice", due_date=datetime(2025, 5, 1))
+        add(db, "Standup", due_date=datetime(2025, 6, 15, 9, 30))
+        add(db, "Holiday", due_date=datetime(2025, 7, 1))
+        add(db, "Someday")
+        add(db, "Done overdue", completed=True, due_date=datetime(2025, 1, 1))
+
+        buckets = local_summary.bucket_counts(db, TODAY)
+
+        assert buckets["overdue"] == local_summary.Bucket(2, datetime(2025, 5, 1), "Older invoice")
+        assert buckets["today"].count == 1
+        assert buckets["upcoming"].next_title == "Holiday"
+        assert buckets["undated"].count == 1
+        assert buckets["completed"].count == 1
+
+
+class TestPromptContext:
+    """Test the rows collected for the compact AI prompt."""
+
+    def test_top_titles_by_due_date(self, db):
+        """Test that the oldest overdue and soonest upcoming titles come first."""
+        for day in (3, 1, 2):
+            add(db, f"Late {day}", due_date=datetime(2025, 5, day))
+        for day in (20, 16, 18):
+            add(db, f"Soon {day}", due_date=datetime(2025, 6, day))
+        add(db, "Done", completed=True, due_date=datetime(2025, 5, 1))
+
+        context = local_summary.prompt_context(db, TODAY, 2)
+
+        assert [title for title, _ in context.overdue] == ["Late 1", "Late 2"]
+        assert [title for title, _ in context.upcoming] == ["Soon 16", "Soon 18"]
+        assert context.buckets["overdue"].count == 3
+
+
+class TestRenderSummary:
+    """Test the template sentences of the local summary."""
+
+    def test_no_todos(self):
+        """Test that no buckets gives the same message as the AI summary."""
+        assert local_summary.render_summary({}) == ai_summary.NO_TODOS_MESSAGE
+
+    def test_overdue_first(self):
+        """Test that overdue work is mentioned before anything else."""
+        summary = local_summary.render_summary({
+            "upcoming": local_summary.Bucket(3, datetime(2025, 7, 1), "Holiday"),
+            "overdue": local_summary.Bucket(1, datetime(2025, 5, 1), "Invoice"),
+            "completed": local_summary.Bucket(2, None, "x"),
+        })
+
+        assert summary == (
+            'You have 1 overdue task, the oldest is "Invoice". '
+            '3 upcoming tasks ahead, next up is "Holiday" on 2025-07-01. '
+            "You've already completed 2 tasks, keep it up!"
+        )
+
+    def test_all_completed(self):
+        """Test the message when nothing is left to do."""
+        summary = local_summary.render_summary({"completed": local_summary.Bucket(4, None, "x")})
+
+        assert summary == "All 4 tasks are completed. Enjoy your day!"
+
+    def test_deterministic(self, db):
+        """Test that the same rows always render the same summary."""
+        add(db, "Task", due_date=datetime(2025, 6, 20))
+
+        first = local_summary.generate_local_summary(db, TODAY)
+
+        assert local_summary.generate_local_summary(db, TODAY) == first
+
+
+class TestSummaryFallback:
+    """Test that the summary endpoints fall back to the local summary."""
+
+    def test_local_backend_skips_model(self, client, created_todo, monkeypatch):
+        """Test that SUMMARY_BACKEND=local never calls the model."""
+        monkeypatch.setattr(ai_summary, "SUMMARY_BACKEND", "local")
+
+        with patch('ai_summary.async_client.chat.completions.create', new_callable=AsyncMock) as mock_create:
+            response = client.get("/todos/summary")
+
+        assert response.status_code == 200
+        assert response.headers["X-Summary-Source"] == "local"
+        assert "Test Todo" in response.json()
+        mock_create.assert_not_called()
+
+    def test_model_error_falls_back(self, client, created_todo):
+        """Test that a failing model is answered with the local summary."""
+        with patch('ai_summary.async_client.chat.completions.create', new_callable=AsyncMock) as mock_create:
+            mock_create.side_effect = Exception("API Error")
+            response = client.get("/todos/summary")
+
+        assert response.headers["X-Summary-Source"] == "local"
+        assert response.json() != ai_summary.ERROR_MESSAGE
+        assert "Test Todo" in response.json()
+
+    def test_model_timeout_falls_back(self, client, created_todo, monkeypatch):
+        """Test that a model slower than LLM_SUMMARY_TIMEOUT is abandoned."""
+        monkeypatch.setattr(ai_summary, "LLM_SUMMARY_TIMEOUT", 0.05)
+
+        async def slow_completion(**kwargs):
+            await asyncio.sleep(1)
+
+        with patch('ai_summary.async_client.chat.completions.create', side_effect=slow_completion):
+            response = client.get("/todos/summary")
+
+        assert response.headers["X-Summary-Source"] == "local"
+
+    def test_prompt_preparation_counts_towards_timeout(self, monkeypatch):
+        """Test that LLM_SUMMARY_TIMEOUT bounds prompt preparation too."""
+        monkeypatch.setattr(ai_summary, "LLM_SUMMARY_TIMEOUT", 0.05)
+
+        async def slow_prompt():
+            await asyncio.sleep(1)
+            return "prompt"
+
+        with patch('ai_summary.async_client.chat.completions.create', new_callable=AsyncMock) as mock_create:
+            summary = asyncio.run(ai_summary.summarize(slow_prompt))
+
+        assert summary is None
+        mock_create.assert_not_called()
+
+    def test_stream_first_token_timeout_falls_back(self, client, created_todo, monkeypatch):
+        """Test that a stream with no token within LLM_SUMMARY_TIMEOUT serves the local summary."""
+        monkeypatch.setattr(ai_summary, "LLM_SUMMARY_TIMEOUT", 0.05)
+        monkeypatch.setattr(ai_summary, "async_client", fake_llm.FakeAsyncOpenAI(reply="Too late.", delay=1))
+
+        body = client.get("/todos/summary/stream").text
+
+        assert "Too late" not in body
+        assert "Test Todo" in body
+        assert '"source": "local"' in body
+
+    def test_local_stream(self, client, created_todo, monkeypatch):
+        """Test that the stream endpoint serves the local summary in local mode."""
+        monkeypatch.setattr(ai_summary, "SUMMARY_BACKEND", "local")
+
+        body = client.get("/todos/summary/stream").text
+
+        assert "event: delta" in body
+        assert '"source": "local"' in body
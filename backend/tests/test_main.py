@@ -1,6 +1,16 @@
+import json
 import pytest
-from datetime import datetime
+from datetime import datetime, timedelta
 from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, Mock, patch
+from sqlalchemy import insert, text
+import database
+import main
+import models
+import queries
+import schemas
+import serialization
+import versioning
 
 
 class TestRootEndpoint:
@@ -284,4 +294,629 @@ class TestEdgeCases:
         for todo in todos:
             response = client.post("/todos/", json=todo)
             assert response.status_code == 200
-            assert response.json()["due_date"] == todo["due_date"]
\ No newline at end of file
+            assert response.json()["due_date"] == todo["due_date"]
+
+class TestTodosPagination:
+    """Test keyset pagination of the todo list."""
+
+    def test_first_page_respects_limit(self, client, multiple_created_todos):
+        """Test that limit bounds the page and a next cursor is returned."""
+        response = client.get("/todos/?limit=2")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert [todo["id"] for todo in data] == [todo["id"] for todo in multiple_created_todos[:2]]
+        assert "X-Next-Cursor" in response.headers
+
+    def test_follow_cursor_to_last_page(self, client, multiple_created_todos):
+        """Test that following the cursor returns the remaining todos and then stops."""
+        first = client.get("/todos/?limit=2")
+        cursor = first.headers["X-Next-Cursor"]
+
+        second = client.get(f"/todos/?limit=2&cursor={cursor}")
+
+        assert second.status_code == 200
+        assert [todo["id"] for todo in second.json()] == [multiple_created_todos[2]["id"]]
+        assert "X-Next-Cursor" not in second.headers
+
+    def test_pages_do_not_overlap(self, client):
+        """Test that walking every page visits each todo exactly once."""
+        for i in range(7):
+            client.post("/todos/", json={"title": f"Todo {i}"})
+
+        seen = []
+        url = "/todos/?limit=3"
+        while url:
+            response = client.get(url)
+            seen.extend(todo["id"] for todo in response.json())
+            cursor = response.headers.get("X-Next-Cursor")
+            url = f"/todos/?limit=3&cursor={cursor}" if cursor else None
+
+        assert len(seen) == 7
+        assert len(set(seen)) == 7
+
+    def test_invalid_cursor(self, client):
+        """Test that a malformed cursor is rejected."""
+        response = client.get("/todos/?cursor=not-a-cursor")
+
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Invalid cursor"
+
+    def test_limit_out_of_bounds(self, client):
+        """Test that limits outside the allowed range are rejected."""
+        assert client.get("/todos/?limit=0").status_code == 422
+        assert client.get("/todos/?limit=100000").status_code == 422
+
+
+class TestTodosExport:
+    """Test the streaming export of todos."""
+
+    def test_export_ndjson(self, client, multiple_created_todos):
+        """Test that the NDJSON export emits one todo per line."""
+        response = client.get("/todos/export?format=ndjson")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [todo["id"] for todo in lines] == [todo["id"] for todo in multiple_created_todos]
+        assert lines[0]["title"] == multiple_created_todos[0]["title"]
+
+    def test_export_json_array(self, client, multiple_created_todos):
+        """Test that the JSON export is a single valid array."""
+        response = client.get("/todos/export?format=json")
+
+        assert response.status_code == 200
+        assert response.json() == client.get("/todos/").json()
+
+    @pytest.mark.parametrize("fmt", ["ndjson", "json"])
+    def test_export_yields_one_chunk_per_batch(self, client, test_db, multiple_created_todos, monkeypatch, fmt):
+        """Test that rows are streamed in batches, not one chunk per row."""
+        monkeypatch.setattr(main, "EXPORT_BATCH_SIZE", 2)
+
+        with test_db() as session:
+            chunks = list(main._export_rows(session.get_bind(), fmt))
+
+        batches = -(-len(multiple_created_todos) // 2)
+        assert len(chunks) == batches + (2 if fmt == "json" else 0)
+        assert "".join(chunks) == client.get(f"/todos/export?format={fmt}").text
+
+    def test_export_empty(self, client):
+        """Test exporting an empty table."""
+        assert client.get("/todos/export?format=ndjson").text == ""
+        assert client.get("/todos/export?format=json").json() == []
+
+    def test_export_invalid_format(self, client):
+        """Test that unknown export formats are rejected."""
+        response = client.get("/todos/export?format=csv")
+
+        assert response.status_code == 422
+
+
+class TestTodosBulkCreate:
+    """Test bulk creation of todos."""
+
+    def test_bulk_create_returns_ids(self, client, sample_todos_data):
+        """Test that a bulk insert returns the assigned ids in request order."""
+        response = client.post("/todos/bulk", json=sample_todos_data)
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["count"] == 3
+        assert "todos" not in data
+
+        titles = [client.get(f"/todos/{todo_id}").json()["title"] for todo_id in data["ids"]]
+        assert titles == [todo["title"] for todo in sample_todos_data]
+
+    def test_bulk_create_echo(self, client, sample_todos_data):
+        """Test that echo=true returns the created todos."""
+        response = client.post("/todos/bulk?echo=true", json=sample_todos_data)
+
+        assert response.status_code == 200
+        data = response.json()
+        assert [todo["id"] for todo in data["todos"]] == data["ids"]
+        assert data["todos"][1]["completed"] is True
+        assert all("created_at" in todo for todo in data["todos"])
+
+    def test_bulk_create_echo_keeps_null_fields(self, client):
+        """Test that echoed todos have the full Todo shape, nulls included."""
+        response = client.post("/todos/bulk?echo=true", json=[{"title": "Bare"}])
+
+        todo = response.json()["todos"][0]
+        assert todo["description"] is None
+        assert todo["due_date"] is None
+        assert set(todo) == set(schemas.Todo.model_fields)
+
+    def test_bulk_create_many(self, client, monkeypatch):
+        """Test inserting thousands of todos in a few multi-row statements."""
+        monkeypatch.setattr(database, "QUERY_DEBUG_HEADERS", True)
+        todos = [{"title": f"Todo {i}"} for i in range(2000)]
+
+        response = client.post("/todos/bulk", json=todos)
+
+        assert response.status_code == 200
+        assert response.json()["count"] == 2000
+        ids = response.json()["ids"]
+        assert ids == sorted(set(ids))
+        # 1,000 rows per INSERT (insertmanyvalues_page_size)
+        assert int(response.headers["X-DB-Queries"]) <= 2
+        last = client.get(f"/todos/{ids[-1]}").json()
+        assert last["title"] == "Todo 1999"
+
+    def test_bulk_create_empty(self, client):
+        """Test that an empty array is accepted."""
+        response = client.post("/todos/bulk", json=[])
+
+        assert response.status_code == 200
+        assert response.json() == {"count": 0, "ids": []}
+
+    def test_bulk_create_invalid_item(self, client):
+        """Test that one invalid item rejects the whole request."""
+        response = client.post("/todos/bulk", json=[{"title": "Valid"}, {"description": "No title"}])
+
+        assert response.status_code == 422
+        assert response.json()["detail"][0]["loc"] == ["body", 1, "title"]
+        assert client.get("/todos/").json() == []
+
+
+class TestTodosBulkUpdateDelete:
+    """Test filter-driven bulk update and delete."""
+
+    def test_complete_overdue_todos(self, client, multiple_created_todos):
+        """Test marking every pending todo due before a date as completed."""
+        response = client.patch(
+            "/todos/?completed=false&due_before=2025-06-01T00:00:00",
+            json={"completed": True},
+        )
+
+        assert response.status_code == 200
+        assert response.json() == {"updated": 1}
+        todos = {todo["id"]: todo for todo in client.get("/todos/").json()}
+        assert todos[multiple_created_todos[0]["id"]]["completed"] is True
+        # Todo without a due date is not matched by a date filter
+        assert todos[multiple_created_todos[2]["id"]]["completed"] is False
+
+    def test_update_without_filters_updates_all(self, client, multiple_created_todos):
+        """Test that an unfiltered bulk update touches every todo."""
+        response = client.patch("/todos/", json={"description": "Bulk"})
+
+        assert response.json() == {"updated": 3}
+        assert all(todo["description"] == "Bulk" for todo in client.get("/todos/").json())
+
+    def test_update_requires_fields(self, client, multiple_created_todos):
+        """Test that an empty update body is rejected."""
+        response = client.patch("/todos/?completed=false", json={})
+
+        assert response.status_code == 400
+
+    def test_update_rejects_null_title(self, client, multiple_created_todos):
+        """Test that a bulk update cannot clear the title."""
+        response = client.patch("/todos/", json={"title": None})
+
+        assert response.status_code == 422
+
+    def test_delete_completed_todos(self, client, multiple_created_todos):
+        """Test deleting every completed todo."""
+        response = client.delete("/todos/?completed=true")
+
+        assert response.status_code == 200
+        assert response.json() == {"deleted": 1}
+        remaining = [todo["id"] for todo in client.get("/todos/").json()]
+        assert multiple_created_todos[1]["id"] not in remaining
+        assert len(remaining) == 2
+
+    def test_delete_by_due_range(self, client, multiple_created_todos):
+        """Test deleting todos within a due date range."""
+        response = client.delete("/todos/?due_after=2025-01-15T00:00:00&due_before=2025-03-01T00:00:00")
+
+        assert response.json() == {"deleted": 1}
+
+    def test_delete_requires_filter(self, client, multiple_created_todos):
+        """Test that a bare bulk delete is refused."""
+        response = client.delete("/todos/")
+
+        assert response.status_code == 400
+        assert len(client.get("/todos/").json()) == 3
+
+
+class TestTodoPatch:
+    """Test partial updates with PATCH."""
+
+    def test_patch_single_field(self, client, created_todo):
+        """Test that PATCH only changes the fields sent."""
+        response = client.patch(f"/todos/{created_todo['id']}", json={"completed": True})
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["completed"] is True
+        assert data["title"] == created_todo["title"]
+        assert data["description"] == created_todo["description"]
+        assert data["created_at"] == created_todo["created_at"]
+
+    def test_patch_clear_due_date(self, client, created_todo):
+        """Test that optional fields can be cleared explicitly."""
+        response = client.patch(f"/todos/{created_todo['id']}", json={"due_date": None})
+
+        assert response.status_code == 200
+        assert response.json()["due_date"] is None
+        assert client.get(f"/todos/{created_todo['id']}").json()["due_date"] is None
+
+    def test_patch_empty_body(self, client, created_todo):
+        """Test that an empty PATCH returns the todo unchanged."""
+        response = client.patch(f"/todos/{created_todo['id']}", json={})
+
+        assert response.status_code == 200
+        assert response.json() == client.get(f"/todos/{created_todo['id']}").json()
+
+    def test_patch_not_found(self, client):
+        """Test patching a todo that doesn't exist."""
+        response = client.patch("/todos/999", json={"completed": True})
+
+        assert response.status_code == 404
+        assert response.json()["detail"] == "Todo not found"
+
+    def test_patch_rejects_null_title(self, client, created_todo):
+        """Test that the title cannot be cleared."""
+        response = client.patch(f"/todos/{created_todo['id']}", json={"title": None})
+
+        assert response.status_code == 422
+
+
+class TestTodosFilterSort:
+    """Test server-side filtering and sorting of the todo list."""
+
+    def test_filter_completed(self, client, multiple_created_todos):
+        """Test filtering by completion status."""
+        pending = client.get("/todos/?completed=false").json()
+        done = client.get("/todos/?completed=true").json()
+
+        assert [todo["title"] for todo in pending] == ["Todo 1", "Todo 3"]
+        assert [todo["title"] for todo in done] == ["Todo 2"]
+
+    def test_filter_due_range(self, client, multiple_created_todos):
+        """Test filtering by due date bounds."""
+        before = client.get("/todos/?due_before=2025-01-15T00:00:00").json()
+        after = client.get("/todos/?due_after=2025-01-15T00:00:00").json()
+
+        assert [todo["title"] for todo in before] == ["Todo 1"]
+        assert [todo["title"] for todo in after] == ["Todo 2"]
+
+    def test_sort_by_due_date(self, client, multiple_created_todos):
+        """Test that sort=due_date puts todos without a due date first."""
+        response = client.get("/todos/?sort=due_date")
+
+        assert [todo["title"] for todo in response.json()] == ["Todo 3", "Todo 1", "Todo 2"]
+
+    def test_sort_invalid(self, client):
+        """Test that unknown sort keys are rejected."""
+        assert client.get("/todos/?sort=title").status_code == 422
+
+    @pytest.mark.parametrize("sort", ["id", "due_date", "created_at"])
+    def test_paginate_sorted_and_filtered(self, client, sort):
+        """Test that keyset pages stay consistent under every sort order."""
+        todos = [
+            {"title": f"Todo {i}", "completed": i % 3 == 0, "due_date": None if i % 4 == 0 else f"2025-0{1 + i % 5}-01T00:00:00"}
+            for i in range(20)
+        ]
+        client.post("/todos/bulk", json=todos)
+        expected = client.get(f"/todos/?completed=false&sort={sort}&limit=100").json()
+
+        seen = []
+        url = f"/todos/?completed=false&sort={sort}&limit=3"
+        while url:
+            response = client.get(url)
+            seen.extend(response.json())
+            cursor = response.headers.get("X-Next-Cursor")
+            url = f"/todos/?completed=false&sort={sort}&limit=3&cursor={cursor}" if cursor else None
+
+        assert seen == expected
+        assert len(seen) == 13
+
+    def test_cursor_from_other_sort_rejected(self, client, multiple_created_todos):
+        """Test that a cursor is only valid for the sort it was issued for."""
+        cursor = client.get("/todos/?limit=1").headers["X-Next-Cursor"]
+
+        response = client.get(f"/todos/?limit=1&sort=due_date&cursor={cursor}")
+
+        assert response.status_code == 400
+
+    @pytest.fixture
+    def analyzed_db(self, test_db):
+        """2,000 todos, a third of them done, with planner statistics."""
+        with test_db() as session:
+            session.execute(insert(models.Todo), [
+                {
+                    "title": f"Todo {i}",
+                    "completed": i % 3 == 0,
+                    "due_date": datetime(2024, 6, 1) + timedelta(hours=3 * i) if i % 5 else None,
+                }
+                for i in range(2000)
+            ])
+            session.execute(text("ANALYZE"))
+            session.commit()
+        return test_db
+
+    def _plan(self, session, params, sort):
+        stmt = queries.list_todos_statement(10, None, sort, queries.todo_filters(**params))
+        compiled = stmt.compile(session.get_bind())
+        values = tuple(compiled.params[name] for name in compiled.positiontup)
+        plan = session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", values).all()
+        return " ".join(row[-1] for row in plan)
+
+    @pytest.mark.parametrize("sort", ["id", "due_date", "created_at"])
+    @pytest.mark.parametrize("params", [
+        {"completed": True},
+        {"completed": False},
+        {"completed": False, "due_before": datetime(2024, 7, 1)},
+        {"completed": True, "due_after": datetime(2024, 12, 1)},
+    ])
+    def test_completed_filter_uses_index(self, analyzed_db, params, sort):
+        """Test that ?completed= is searched through an index under every sort."""
+        with analyzed_db() as session:
+            details = self._plan(session, params, sort)
+
+        assert details.startswith("SEARCH todos USING INDEX ix_todos_"), details
+        # With a due date range only sort=due_date comes off the index in
+        # page order; the other sorts sort the rows found in the range
+        if sort == "due_date" or not set(params) & {"due_before", "due_after"}:
+            assert "TEMP B-TREE" not in details
+
+    @pytest.mark.parametrize("params", [{"due_before": datetime(2024, 7, 1)}, {"due_after": datetime(2024, 12, 1)}])
+    def test_due_range_uses_index_with_due_date_sort(self, analyzed_db, params):
+        """Test that a due date range is searched through ix_todos_due_date."""
+        with analyzed_db() as session:
+            details = self._plan(session, params, "due_date")
+
+        assert details.startswith("SEARCH todos USING INDEX ix_todos_due_date"), details
+
+    @pytest.mark.parametrize("sort", ["id", "created_at"])
+    @pytest.mark.parametrize("params", [
+        {"due_before": datetime(2024, 7, 1)},
+        {"due_after": datetime(2024, 12, 1)},
+        {"completed": False, "due_before": datetime(2024, 7, 1)},
+    ])
+    def test_due_range_uses_index_with_other_sort(self, analyzed_db, params, sort):
+        """Test that a due date range is searched through an index, not filtered over a scan, under any sort."""
+        with analyzed_db() as session:
+            details = self._plan(session, params, sort)
+
+        assert details.startswith("SEARCH todos USING INDEX ix_todos_"), details
+        assert "due_date" in details, details
+
+
+class TestTodosSearch:
+    """Test full-text search over todos."""
+
+    @pytest.fixture
+    def searchable_todos(self, client):
+        todos = [
+            {"title": "Buy milk", "description": "Semi-skimmed milk from the corner shop"},
+            {"title": "Groceries", "description": "Bread, eggs and milk"},
+            {"title": "Walk the dog", "description": "Around the park"},
+            {"title": "Book dentist", "description": None},
+        ]
+        return client.post("/todos/bulk?echo=true", json=todos).json()["todos"]
+
+    def test_search_ranks_matches(self, client, searchable_todos):
+        """Test that matches are returned best rank first with scores."""
+        response = client.get("/todos/search?q=milk")
+
+        assert response.status_code == 200
+        hits = response.json()
+        assert [hit["title"] for hit in hits] == ["Buy milk", "Groceries"]
+        assert hits[0]["rank"] <= hits[1]["rank"]
+
+    def test_search_snippets_highlight_terms(self, client, searchable_todos):
+        """Test that snippets wrap matched terms in <mark> tags."""
+        hit = client.get("/todos/search?q=dog").json()[0]
+
+        assert hit["title_snippet"] == "Walk the <mark>dog</mark>"
+
+    def test_search_prefix(self, client, searchable_todos):
+        """Test prefix queries with a trailing *."""
+        titles = [hit["title"] for hit in client.get("/todos/search?q=groc*").json()]
+        assert titles == ["Groceries"]
+        assert client.get("/todos/search?q=groc").json() == []
+
+    def test_search_tracks_writes(self, client, searchable_todos):
+        """Test that the index follows updates and deletes."""
+        dog = next(todo for todo in searchable_todos if todo["title"] == "Walk the dog")
+        client.patch(f"/todos/{dog['id']}", json={"title": "Walk the cat"})
+        assert client.get("/todos/search?q=dog").json() == []
+        assert len(client.get("/todos/search?q=cat").json()) == 1
+
+        client.delete(f"/todos/{dog['id']}")
+        assert client.get("/todos/search?q=cat").json() == []
+
+    def test_search_ignores_query_syntax(self, client, searchable_todos):
+        """Test that FTS5 operators in user input cannot break the query."""
+        response = client.get('/todos/search?q=milk" OR NEAR(')
+
+        assert response.status_code == 200
+
+    def test_search_paginated(self, client):
+        """Test paging through search results with a cursor."""
+        client.post("/todos/bulk", json=[{"title": f"Report {i}"} for i in range(5)])
+
+        first = client.get("/todos/search?q=report&limit=3")
+        second = client.get(f"/todos/search?q=report&limit=3&cursor={first.headers['X-Next-Cursor']}")
+
+        ids = [hit["id"] for hit in first.json() + second.json()]
+        assert len(ids) == 5
+        assert len(set(ids)) == 5
+        assert "X-Next-Cursor" not in second.headers
+
+
+class TestConditionalGet:
+    """Test ETag / Last-Modified validators driven by the data version."""
+
+    def test_list_has_validators(self, client, created_todo):
+        """Test that the list carries an ETag and Last-Modified."""
+        response = client.get("/todos/")
+
+        assert response.headers["ETag"]
+        assert response.headers["Last-Modified"].endswith("GMT")
+        assert response.headers["Cache-Control"] == "no-cache"
+
+    def test_unchanged_list_is_304(self, client, created_todo):
+        """Test that a matching If-None-Match gets an empty 304."""
+        etag = client.get("/todos/").headers["ETag"]
+
+        response = client.get("/todos/", headers={"If-None-Match": etag})
+
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["ETag"] == etag
+
+    def test_write_changes_etag(self, client, created_todo):
+        """Test that any write makes old ETags miss."""
+        etag = client.get("/todos/").headers["ETag"]
+        client.patch(f"/todos/{created_todo['id']}", json={"completed": True})
+
+        response = client.get("/todos/", headers={"If-None-Match": etag})
+
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+        assert response.json()[0]["completed"] is True
+
+    def test_etag_depends_on_query(self, client, created_todo):
+        """Test that different pages or filters never share an ETag."""
+        assert client.get("/todos/").headers["ETag"] != client.get("/todos/?completed=true").headers["ETag"]
+
+    def test_item_304(self, client, created_todo):
+        """Test conditional GET on a single todo."""
+        url = f"/todos/{created_todo['id']}"
+        etag = client.get(url).headers["ETag"]
+
+        assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+        client.delete(url)
+        assert client.get(url, headers={"If-None-Match": etag}).status_code == 404
+
+    def test_if_modified_since(self, client, test_db, created_todo):
+        """Test that If-Modified-Since is honored when no ETag is sent."""
+        # Back-date the last write, so its second is over before the read
+        db = test_db()
+        db.execute(text("UPDATE todos_version SET modified_at = modified_at - 5"))
+        db.commit()
+        db.close()
+        last_modified = client.get("/todos/").headers["Last-Modified"]
+
+        response = client.get("/todos/", headers={"If-Modified-Since": last_modified})
+
+        assert response.status_code == 304
+
+    def test_if_modified_since_sees_write_in_same_second(self, client, created_todo):
+        """Test that a write in the same second as the Last-Modified date is not answered with 304."""
+        last_modified = client.get("/todos/").headers["Last-Modified"]
+        client.patch(f"/todos/{created_todo['id']}", json={"completed": True})
+
+        response = client.get("/todos/", headers={"If-Modified-Since": last_modified})
+
+        assert response.status_code == 200
+        assert response.json()[0]["completed"] is True
+
+    def test_version_bumped_by_every_write(self, client, test_db):
+        """Test that the trigger bumps the version once per written row."""
+        db = test_db()
+        before = versioning.current(db).version
+        db.close()
+
+        client.post("/todos/bulk", json=[{"title": "A"}, {"title": "B"}])
+
+        db = test_db()
+        assert versioning.current(db).version == before + 2
+        db.close()
+
+    def test_summary_304_skips_model(self, client, created_todo):
+        """Test that an unchanged summary is revalidated without generating it."""
+        with patch('ai_summary.async_client.chat.completions.create', new_callable=AsyncMock) as mock_create:
+            mock_create.return_value = Mock(choices=[Mock(message=Mock(content="Summary"))])
+            etag = client.get("/todos/summary").headers["ETag"]
+            response = client.get("/todos/summary", headers={"If-None-Match": etag})
+
+        assert response.status_code == 304
+        mock_create.assert_called_once()
+
+    def test_failed_summary_has_no_etag(self, client, created_todo):
+        """Test that a local fallback after a model error is not revalidated later."""
+        with patch('ai_summary.async_client.chat.completions.create', new_callable=AsyncMock) as mock_create:
+            mock_create.side_effect = Exception("API Error")
+            response = client.get("/todos/summary")
+
+        assert "ETag" not in response.headers
+
+
+class TestTodosSerialization:
+    """Test the row serializer behind GET /todos/."""
+
+    def test_matches_response_model(self, client, test_db):
+        """Test that the fast path emits exactly what schemas.Todo would."""
+        client.post("/todos/bulk", json=[
+            {"title": "Dated", "due_date": "2025-03-01T10:20:30.123456", "description": "ünïcode"},
+            {"title": "Undated", "completed": True},
+        ])
+        db = test_db()
+        expected = [schemas.Todo.model_validate(t).model_dump(mode="json") for t in db.query(models.Todo).all()]
+        db.close()
+
+        response = client.get("/todos/")
+
+        assert response.headers["content-type"] == "application/json"
+        assert response.json() == expected
+
+    def test_headers_survive(self, client):
+        """Test that headers set by the handler reach the raw response."""
+        client.post("/todos/bulk", json=[{"title": f"Todo {i}"} for i in range(3)])
+
+        response = client.get("/todos/?limit=2")
+
+        assert "X-Next-Cursor" in response.headers
+        assert "ETag" in response.headers
+        assert len(response.json()) == 2
+
+
+class TestTodosSparseFields:
+    """Test ?fields= on GET /todos/."""
+
+    def test_only_requested_fields(self, client, created_todo):
+        """Test that only the requested fields are returned, id always among them."""
+        response = client.get("/todos/?fields=title,completed")
+
+        assert response.status_code == 200
+        assert response.json() == [{"id": created_todo["id"], "title": "Test Todo", "completed": False}]
+
+    def test_field_order_is_canonical(self, client, created_todo):
+        """Test that field order in the query does not change the output."""
+        first = client.get("/todos/?fields=due_date,title").json()
+        second = client.get("/todos/?fields=title,due_date,id").json()
+
+        assert first == second
+        assert list(first[0]) == ["id", "title", "due_date"]
+
+    def test_unknown_field_rejected(self, client):
+        """Test that a field the todo does not have is a validation error."""
+        assert client.get("/todos/?fields=title,secret").status_code == 422
+
+    def test_description_not_selected(self, client):
+        """Test that projected columns are all the SELECT reads."""
+        stmt = queries.list_todos_statement(10, columns=serialization.projection(serialization.LIST_FIELDS).columns)
+
+        assert "description" not in str(stmt)
+
+    def test_sparse_pagination_by_sort_column(self, client):
+        """Test paging by a sort column that is not in the field set."""
+        client.post("/todos/bulk", json=[
+            {"title": f"Todo {i}", "due_date": f"2025-01-0{5 - i}T00:00:00"} for i in range(4)
+        ])
+
+        first = client.get("/todos/?fields=title&sort=due_date&limit=2")
+        second = client.get(f"/todos/?fields=title&sort=due_date&limit=2&cursor={first.headers['X-Next-Cursor']}")
+
+        titles = [t["title"] for t in first.json() + second.json()]
+        assert titles == ["Todo 3", "Todo 2", "Todo 1", "Todo 0"]
+        assert all(set(t) == {"id", "title"} for t in first.json())
+
+    def test_projection_is_cached(self):
+        """Test that a field set builds its serializer once."""
+        fields = serialization.parse_fields("title,due_date")
+
+        assert serialization.projection(fields) is serialization.projection(fields)
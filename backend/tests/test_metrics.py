@@ -0,0 +1,98 @@
+import pytest
+import asyncio
+import os
+import sys
+from unittest.mock import AsyncMock, Mock
+from prometheus_client import REGISTRY
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ai_summary
+import fake_llm
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+class TestMetrics:
+    """Test the Prometheus metrics endpoint and what feeds it."""
+
+    def test_metrics_endpoint(self, client):
+        """Test that /metrics serves the text exposition format."""
+        response = client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert "http_request_duration_seconds" in response.text
+        assert "db_query_duration_seconds" in response.text
+
+    def test_request_latency_uses_route_template(self, client, created_todo):
+        """Test that requests are labelled with the route, not the raw path."""
+        labels = {"method": "GET", "route": "/todos/{todo_id}", "status": "200"}
+        before = sample("http_request_duration_seconds_count", **labels)
+
+        client.get(f"/todos/{created_todo['id']}")
+
+        assert sample("http_request_duration_seconds_count", **labels) == before + 1
+        assert sample("http_request_duration_seconds_count", method="GET", route=f"/todos/{created_todo['id']}", status="200") == 0
+
+    def test_unmatched_route(self, client):
+        """Test that unknown paths share one label."""
+        labels = {"method": "GET", "route": "unmatched", "status": "404"}
+        before = sample("http_request_duration_seconds_count", **labels)
+
+        client.get("/no/such/path")
+
+        assert sample("http_request_duration_seconds_count", **labels) == before + 1
+
+    def test_in_flight_returns_to_zero(self, client):
+        """Test that the in-flight gauge is released after each request."""
+        client.get("/")
+
+        assert sample("http_requests_in_flight", method="GET") == 0
+
+    def test_event_streams_tracked_separately(self, client, created_todo, monkeypatch):
+        """Test that SSE connections stay out of the request latency and in-flight metrics."""
+        monkeypatch.setattr(ai_summary, "SUMMARY_BACKEND", "local")
+        route = "/todos/summary/stream"
+        requests = sample("http_request_duration_seconds_count", method="GET", route=route, status="200")
+        streams = sample("http_event_stream_duration_seconds_count", route=route)
+
+        client.get(route)
+
+        assert sample("http_request_duration_seconds_count", method="GET", route=route, status="200") == requests
+        assert sample("http_event_stream_duration_seconds_count", route=route) == streams + 1
+        assert sample("http_event_streams_open", route=route) == 0
+        assert sample("http_requests_in_flight", method="GET") == 0
+
+    def test_db_queries_counted(self, client, created_todo):
+        """Test that statements run through the engine are observed."""
+        before = sample("db_query_duration_seconds_count", operation="SELECT")
+
+        client.get(f"/todos/{created_todo['id']}")
+
+        assert sample("db_query_duration_seconds_count", operation="SELECT") > before
+
+    def test_llm_latency_and_tokens(self, monkeypatch):
+        """Test that model calls record latency and reported token usage."""
+        monkeypatch.setattr(ai_summary, "async_client", fake_llm.FakeAsyncOpenAI(reply="Done."))
+        calls = sample("llm_request_duration_seconds_count", kind="complete")
+        tokens = sample("llm_tokens_total", type="completion")
+
+        asyncio.run(ai_summary.complete("metrics prompt"))
+
+        assert sample("llm_request_duration_seconds_count", kind="complete") == calls + 1
+        assert sample("llm_tokens_total", type="completion") > tokens
+
+    def test_llm_errors(self, monkeypatch):
+        """Test that failed model calls are counted."""
+        failing = Mock()
+        failing.chat.completions.create = AsyncMock(side_effect=Exception("API Error"))
+        monkeypatch.setattr(ai_summary, "async_client", failing)
+        before = sample("llm_errors_total", kind="complete")
+
+        with pytest.raises(Exception):
+            asyncio.run(ai_summary.complete("failing metrics prompt"))
+
+        assert sample("llm_errors_total", kind="complete") == before + 1
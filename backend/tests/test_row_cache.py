@@ -0,0 +1,95 @@
+import pytest
+import os
+import sys
+from sqlalchemy import text
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import row_cache
+
+
+class TestRowCache:
+    """Test the LRU/TTL cache of serialized todos."""
+
+    def test_set_requires_current_version(self):
+        """Test that a row read at an outdated version is not cached."""
+        cache = row_cache.RowCache()
+        cache._version = 5
+
+        cache.set(1, b"old", version=4)
+        cache.set(2, b"new", version=5)
+
+        assert cache.get(1) is None
+        assert cache.get(2) == b"new"
+
+    def test_lru_eviction_and_bytes(self):
+        """Test that the oldest entry goes first and memory is accounted."""
+        cache = row_cache.RowCache(max_entries=2)
+        cache._version = 1
+        for todo_id in (1, 2, 3):
+            cache.set(todo_id, b"x" * 10, version=1)
+
+        stats = cache.stats()
+        assert cache.get(1) is None
+        assert stats["evictions"] == 1
+        assert stats["bytes"] == 20
+        assert stats["approx_memory_bytes"] > 20
+
+    def test_ttl(self):
+        """Test that expired entries are misses."""
+        cache = row_cache.RowCache(ttl=-1)
+        cache._version = 1
+        cache.set(1, b"x", version=1)
+
+        assert cache.get(1) is None
+
+
+class TestTodoReadCache:
+    """Test GET /todos/{id} through the row cache."""
+
+    def test_repeat_read_is_a_hit(self, client, created_todo):
+        """Test that the second read of an id is served from the cache."""
+        first = client.get(f"/todos/{created_todo['id']}")
+        second = client.get(f"/todos/{created_todo['id']}")
+
+        stats = client.get("/cache/stats").json()["rows"]
+        assert first.json() == second.json() == created_todo
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["size"] == 1
+
+    @pytest.mark.parametrize("write", ["put", "patch"])
+    def test_update_evicts(self, client, created_todo, write):
+        """Test that an update is visible on the next read."""
+        url = f"/todos/{created_todo['id']}"
+        client.get(url)
+        body = {**created_todo, "title": "Changed"} if write == "put" else {"title": "Changed"}
+        getattr(client, write)(url, json=body)
+
+        assert client.get(url).json()["title"] == "Changed"
+
+    def test_delete_evicts(self, client, created_todo):
+        """Test that a deleted todo is not served from the cache."""
+        url = f"/todos/{created_todo['id']}"
+        client.get(url)
+        client.delete(url)
+
+        assert client.get(url).status_code == 404
+
+    def test_bulk_update_invalidates(self, client, multiple_created_todos):
+        """Test that filter-based writes drop every cached row."""
+        url = f"/todos/{multiple_created_todos[0]['id']}"
+        client.get(url)
+        client.patch("/todos/?completed=false", json={"title": "Bulk"})
+
+        assert client.get(url).json()["title"] == "Bulk"
+
+    def test_write_from_another_process(self, client, test_db, created_todo):
+        """Test that a write this process never saw is picked up from the changelog."""
+        url = f"/todos/{created_todo['id']}"
+        client.get(url)
+        with test_db() as other:
+            other.execute(text("UPDATE todos SET title = 'Elsewhere' WHERE id = :id"), {"id": created_todo["id"]})
+            other.commit()
+
+        assert client.get(url).json()["title"] == "Elsewhere"
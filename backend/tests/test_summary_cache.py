@@ -0,0 +1,120 @@
+import pytest
+from datetime import date, datetime
+from unittest.mock import Mock, patch
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import models
+import summary_cache
+
+
+def make_todo(title, completed=False, due_date=None):
+    todo = Mock(spec=models.Todo)
+    todo.title = title
+    todo.completed = completed
+    todo.due_date = due_date
+    return todo
+
+
+class TestCacheKey:
+    """Test the content hash used as the summary cache key."""
+
+    def test_same_todos_same_key(self):
+        """Test that identical prompt inputs hash identically."""
+        todos = [make_todo("Task", False, datetime(2025, 1, 1))]
+        again = [make_todo("Task", False, datetime(2025, 1, 1))]
+
+        assert summary_cache.cache_key(todos, date(2025, 1, 1)) == summary_cache.cache_key(again, date(2025, 1, 1))
+
+    @pytest.mark.parametrize("changed", [
+        make_todo("Other task", False, datetime(2025, 1, 1)),
+        make_todo("Task", True, datetime(2025, 1, 1)),
+        make_todo("Task", False, datetime(2025, 1, 2)),
+        make_todo("Task", False, None),
+    ])
+    def test_prompt_fields_change_key(self, changed):
+        """Test that any prompt-relevant field change produces a new key."""
+        original = [make_todo("Task", False, datetime(2025, 1, 1))]
+
+        assert summary_cache.cache_key(original, date(2025, 1, 1)) != summary_cache.cache_key([changed], date(2025, 1, 1))
+
+    def test_date_bucket_changes_key(self):
+        """Test that the key rolls over at midnight."""
+        todos = [make_todo("Task", False, datetime(2025, 1, 1))]
+
+        assert summary_cache.cache_key(todos, date(2025, 1, 1)) != summary_cache.cache_key(todos, date(2025, 1, 2))
+
+
+class TestSummaryCache:
+    """Test the LRU/TTL summary cache."""
+
+    def test_hit_and_miss_counters(self):
+        """Test that lookups are counted."""
+        cache = summary_cache.SummaryCache()
+        assert cache.get("a") is None
+        cache.set("a", "summary")
+        assert cache.get("a") == "summary"
+
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_ratio"] == 0.5
+
+    def test_ttl_expiry(self):
+        """Test that entries expire after the TTL."""
+        cache = summary_cache.SummaryCache(ttl=10)
+        with patch("summary_cache.time.monotonic", return_value=100.0):
+            cache.set("a", "summary")
+        with patch("summary_cache.time.monotonic", return_value=111.0):
+            assert cache.get("a") is None
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first."""
+        cache = summary_cache.SummaryCache(max_entries=2)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.get("a")
+        cache.set("c", "3")
+
+        assert cache.get("b") is None
+        assert cache.get("a") == "1"
+        assert cache.stats()["evictions"] == 1
+
+    def test_invalidate(self):
+        """Test that invalidation empties the cache."""
+        cache = summary_cache.SummaryCache()
+        cache.set("a", "1")
+        cache.invalidate()
+
+        assert cache.get("a") is None
+        assert cache.stats()["invalidations"] == 1
+
+
+class TestWriteInvalidation:
+    """Test which writes invalidate the summary cache."""
+
+    @pytest.mark.parametrize("method, url", [
+        ("put", "/todos/999"),
+        ("patch", "/todos/999"),
+        ("delete", "/todos/999"),
+        ("patch", "/todos/?completed=true"),
+        ("delete", "/todos/?completed=true"),
+    ])
+    def test_write_matching_nothing_keeps_cache(self, client, created_todo, method, url):
+        """Test that a 404 or a bulk write matching no rows leaves the cache alone."""
+        body = {"title": "Changed"} if method in ("put", "patch") else None
+        before = summary_cache.cache.stats()["invalidations"]
+
+        client.request(method.upper(), url, json=body)
+
+        assert summary_cache.cache.stats()["invalidations"] == before
+
+    def test_write_invalidates_cache(self, client, created_todo):
+        """Test that a write that changed a todo invalidates the cache."""
+        before = summary_cache.cache.stats()["invalidations"]
+
+        client.patch(f"/todos/{created_todo['id']}", json={"completed": True})
+
+        assert summary_cache.cache.stats()["invalidations"] == before + 1
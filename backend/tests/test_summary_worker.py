@@ -0,0 +1,238 @@
+import asyncio
+import pytest
+import os
+import sys
+from datetime import date
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ai_summary
+import summary_worker
+import versioning
+
+TODAY = date(2025, 6, 15)
+
+
+class CountingCompute:
+    """Stands in for the summary generator; numbers each summary it makes."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+        # What the next summary is computed from and by
+        self.version = 1
+        self.day = TODAY
+        self.source = "llm"
+
+    async def __call__(self):
+        self.calls += 1
+        version, day, source = self.version, self.day, self.source
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return f"Summary {self.calls}", source, version, day
+
+
+class TestSummaryRefresher:
+    """Test debounced background recomputation of the summary."""
+
+    def test_first_request_computes(self):
+        """Test that without a summary yet the request computes one."""
+        compute = CountingCompute()
+        refresher = summary_worker.SummaryRefresher(compute)
+
+        snapshot = asyncio.run(refresher.current(1, TODAY))
+
+        assert snapshot.summary == "Summary 1"
+        assert snapshot.stale is False
+        assert compute.calls == 1
+
+    def test_write_serves_stale_without_waiting(self):
+        """Test that after a write the previous summary is served, flagged stale."""
+        compute = CountingCompute()
+        refresher = summary_worker.SummaryRefresher(compute, debounce=60)
+
+        async def scenario():
+            await refresher.current(1, TODAY)
+            refresher.mark_dirty()
+            return await refresher.current(2, TODAY)
+
+        snapshot = asyncio.run(scenario())
+
+        assert snapshot.summary == "Summary 1"
+        assert snapshot.stale is True
+        assert compute.calls == 1
+
+    def test_burst_of_writes_is_debounced(self):
+        """Test that many writes in a row cause one background refresh."""
+        compute = CountingCompute()
+        refresher = summary_worker.SummaryRefresher(compute, debounce=0.05)
+
+        async def scenario():
+            refresher.start(asyncio.get_running_loop())
+            await asyncio.sleep(0.01)
+            for _ in range(10):
+                compute.version += 1
+                refresher.mark_dirty()
+                await asyncio.sleep(0.005)
+            await asyncio.sleep(0.2)
+            snapshot = await refresher.current(compute.version, TODAY)
+            await refresher.stop()
+            return snapshot
+
+        snapshot = asyncio.run(scenario())
+
+        assert compute.calls == 2
+        assert snapshot.summary == "Summary 2"
+        assert snapshot.stale is False
+
+    def test_max_staleness_refreshes_synchronously(self):
+        """Test that a summary stale for too long is refreshed by the request."""
+        compute = CountingCompute()
+        refresher = summary_worker.SummaryRefresher(compute, debounce=60, max_staleness=0.01)
+
+        async def scenario():
+            await refresher.current(1, TODAY)
+            compute.version = 2
+            refresher.mark_dirty()
+            await asyncio.sleep(0.02)
+            return await refresher.current(2, TODAY)
+
+        snapshot = asyncio.run(scenario())
+
+        assert snapshot.summary == "Summary 2"
+        assert snapshot.stale is False
+
+    def test_write_during_refresh_stays_stale(self):
+        """Test that a write landing mid-refresh leaves the result marked stale."""
+        compute = CountingCompute(delay=0.05)
+        refresher = summary_worker.SummaryRefresher(compute, debounce=60)
+
+        async def scenario():
+            refreshing = asyncio.ensure_future(refresher.refresh())
+            await asyncio.sleep(0.01)
+            refresher.mark_dirty()
+            await refreshing
+            return await refresher.current(2, TODAY)
+
+        snapshot = asyncio.run(scenario())
+
+        assert snapshot.summary == "Summary 1"
+        assert snapshot.stale is True
+
+    def test_write_from_another_process_is_noticed(self):
+        """Test that a newer data version than the summary's is stale and refreshed."""
+        compute = CountingCompute()
+        refresher = summary_worker.SummaryRefresher(compute, debounce=0.01)
+
+        async def scenario():
+            refresher.start(asyncio.get_running_loop())
+            await asyncio.sleep(0.01)
+            compute.version = 2
+            # No mark_dirty: the write happened in another worker
+            stale = await refresher.current(2, TODAY)
+            await asyncio.sleep(0.1)
+            fresh = await refresher.current(2, TODAY)
+            await refresher.stop()
+            return stale, fresh
+
+        stale, fresh = asyncio.run(scenario())
+
+        assert stale.stale is True
+        assert fresh.summary == "Summary 2"
+        assert fresh.stale is False
+
+    def test_new_day_refreshes_synchronously(self):
+        """Test that yesterday's summary is never served as today's."""
+        compute = CountingCompute()
+        refresher = summary_worker.SummaryRefresher(compute, debounce=60)
+
+        async def scenario():
+            await refresher.current(1, TODAY)
+            compute.day = date(2025, 6, 16)
+            return await refresher.current(1, date(2025, 6, 16))
+
+        snapshot = asyncio.run(scenario())
+
+        assert snapshot.summary == "Summary 2"
+        assert snapshot.stale is False
+
+    def test_fallback_is_stale_and_retried(self):
+        """Test that a fallback summary is flagged stale and retried in the background."""
+        compute = CountingCompute()
+        compute.source = "local"
+        refresher = summary_worker.SummaryRefresher(compute, debounce=60, retry_interval=0.05)
+
+        async def scenario():
+            refresher.start(asyncio.get_running_loop())
+            await asyncio.sleep(0.01)
+            fallback = await refresher.current(1, TODAY)
+            compute.source = "llm"
+            await asyncio.sleep(0.1)
+            recovered = await refresher.current(1, TODAY)
+            await refresher.stop()
+            return fallback, recovered
+
+        fallback, recovered = asyncio.run(scenario())
+
+        assert fallback.source == "local"
+        assert fallback.stale is True
+        assert recovered.source == "llm"
+        assert recovered.stale is False
+
+
+class DatabaseCompute(CountingCompute):
+    """Computes from the test database's current data version."""
+
+    def __init__(self, session_factory):
+        super().__init__()
+        self.session_factory = session_factory
+
+    async def __call__(self):
+        with self.session_factory() as db:
+            self.version = versioning.current(db).version
+        self.day = date.today()
+        return await super().__call__()
+
+
+class TestSummaryEndpointPrecompute:
+    """Test /todos/summary while the background refresher is running."""
+
+    @pytest.fixture
+    def refresher(self, monkeypatch, test_db):
+        refresher = summary_worker.SummaryRefresher(DatabaseCompute(test_db), debounce=60)
+        monkeypatch.setattr(summary_worker, "refresher", refresher)
+        return refresher
+
+    def test_serves_latest_with_age_and_staleness(self, client, refresher):
+        """Test that the endpoint reports the summary's age and staleness."""
+        first = client.get("/todos/summary")
+        client.post("/todos/", json={"title": "New"})
+        second = client.get("/todos/summary")
+
+        assert first.json() == second.json() == "Summary 1"
+        assert first.headers["X-Summary-Stale"] == "false"
+        assert "ETag" in first.headers
+        assert second.headers["X-Summary-Stale"] == "true"
+        assert "ETag" not in second.headers
+        assert float(second.headers["X-Summary-Age"]) >= 0
+        assert refresher.compute.calls == 1
+
+    def test_fallback_is_not_served_as_current(self, client, refresher):
+        """Test that a local fallback is flagged stale and gets no ETag."""
+        refresher.compute.source = "local"
+
+        response = client.get("/todos/summary")
+
+        assert response.headers["X-Summary-Source"] == "local"
+        assert response.headers["X-Summary-Stale"] == "true"
+        assert "ETag" not in response.headers
+
+    def test_slow_refresh_falls_back_within_timeout(self, client, refresher, monkeypatch):
+        """Test that a request waits on a synchronous refresh for LLM_SUMMARY_TIMEOUT at most."""
+        monkeypatch.setattr(ai_summary, "LLM_SUMMARY_TIMEOUT", 0.05)
+        refresher.compute.delay = 0.5
+
+        response = client.get("/todos/summary")
+
+        assert response.headers["X-Summary-Source"] == "local"
+        assert "ETag" not in response.headers
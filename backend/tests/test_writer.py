@@ -0,0 +1,111 @@
+import pytest
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+import models
+import writer
+
+
+def _insert(title):
+    def op(session):
+        todo = models.Todo(title=title)
+        session.add(todo)
+        session.flush()
+        return todo.id
+    return op
+
+
+def _fail(session):
+    raise ValueError("boom")
+
+
+@pytest.fixture
+def test_engine(test_db):
+    """The engine behind the isolated test database."""
+    return test_db.kw["bind"]
+
+
+@pytest.fixture
+def write_queue(test_engine):
+    """A running write queue on the test database."""
+    queue = writer.WriteQueue(test_engine)
+    queue.start()
+    yield queue
+    queue.stop()
+
+
+class TestWriteQueue:
+    """Test the single-writer queue."""
+
+    def test_writes_applied_in_order(self, write_queue, test_db):
+        """Test that operations are applied in submission order."""
+        futures = [write_queue.submit(_insert(f"Todo {i}")) for i in range(5)]
+        ids = [future.result(timeout=5) for future in futures]
+
+        assert ids == sorted(ids)
+        with test_db() as session:
+            titles = [todo.title for todo in session.query(models.Todo).order_by(models.Todo.id)]
+        assert titles == [f"Todo {i}" for i in range(5)]
+
+    def test_pending_writes_share_one_commit(self, test_engine):
+        """Test that writes queued together are committed as one batch."""
+        queue = writer.WriteQueue(test_engine)
+        futures = [queue.submit(_insert(f"Todo {i}")) for i in range(10)]
+
+        queue.start()
+        for future in futures:
+            future.result(timeout=5)
+        queue.stop()
+
+        assert queue.writes == 10
+        assert queue.batches == 1
+
+    def test_failure_is_isolated_to_its_caller(self, test_engine, test_db):
+        """Test that a failing write does not roll back the rest of its batch."""
+        queue = writer.WriteQueue(test_engine)
+        ok_before = queue.submit(_insert("Before"))
+        failing = queue.submit(_fail)
+        ok_after = queue.submit(_insert("After"))
+
+        queue.start()
+        with pytest.raises(ValueError):
+            failing.result(timeout=5)
+        ok_before.result(timeout=5)
+        ok_after.result(timeout=5)
+        queue.stop()
+
+        with test_db() as session:
+            titles = sorted(todo.title for todo in session.query(models.Todo))
+        assert titles == ["After", "Before"]
+
+
+class TestSingleWriterEndpoints:
+    """Test the CRUD endpoints with the single writer enabled."""
+
+    @pytest.fixture(autouse=True)
+    def enable_writer(self, monkeypatch, write_queue):
+        monkeypatch.setattr(main, "write_queue", write_queue)
+
+    def test_crud_through_writer(self, client, sample_todo_data, write_queue):
+        """Test that create, update and delete go through the writer."""
+        created = client.post("/todos/", json=sample_todo_data)
+        assert created.status_code == 200
+        todo_id = created.json()["id"]
+
+        updated = client.put(f"/todos/{todo_id}", json={"title": "Updated", "completed": True})
+        assert updated.status_code == 200
+        assert updated.json()["title"] == "Updated"
+
+        deleted = client.delete(f"/todos/{todo_id}")
+        assert deleted.status_code == 200
+        assert client.get(f"/todos/{todo_id}").status_code == 404
+
+        assert write_queue.writes == 3
+
+    def test_missing_todo_through_writer(self, client):
+        """Test that 404s are still reported when writes are queued."""
+        assert client.put("/todos/999", json={"title": "x"}).status_code == 404
+        assert client.delete("/todos/999").status_code == 404
@@ -0,0 +1,141 @@
+import hashlib
+import math
+import time
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import NamedTuple, Optional
+from fastapi import Request, Response
+from sqlalchemy import event, text
+# from . import models
+import models
+
+# A one-row table holding a counter bumped by triggers on every row written
+# to todos. It lives in the database, so every worker process sees the same
+# version, whichever process or connection made the write.
+VERSION_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS todos_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL,
+        modified_at REAL NOT NULL
+    )
+    """,
+    """
+    INSERT OR IGNORE INTO todos_version (id, version, modified_at)
+    VALUES (1, 0, (julianday('now') - 2440587.5) * 86400.0)
+    """,
+] + [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS todos_version_{op.lower()} AFTER {op} ON todos BEGIN
+        UPDATE todos_version
+        SET version = version + 1, modified_at = (julianday('now') - 2440587.5) * 86400.0
+        WHERE id = 1;
+    END
+    """
+    for op in ("INSERT", "UPDATE", "DELETE")
+]
+
+VERSION_SQL = text("SELECT version, modified_at FROM todos_version WHERE id = 1")
+
+
+class Version(NamedTuple):
+    version: int
+    # When the last write happened, to the millisecond
+    modified_at: datetime
+    # The Last-Modified date, in whole seconds
+    last_modified: datetime
+
+
+def install(connection):
+    """
+    Creates the version table and its triggers if missing.
+    """
+    for ddl in VERSION_DDL:
+        connection.exec_driver_sql(ddl)
+
+
+@event.listens_for(models.Todo.__table__, "after_create")
+def _install_after_create(target, connection, **kw):
+    install(connection)
+
+
+def current(db) -> Version:
+    """
+    Reads the data version; a single-row lookup that never touches todos.
+
+    Read it in the same transaction as the rows it describes, so the ETag
+    and the body come from one snapshot.
+    """
+    read_at = time.time()
+    version, modified_at = db.execute(VERSION_SQL).one()
+    # HTTP dates have whole seconds. The date is rounded up past the write,
+    # so If-Modified-Since can match it, only when that second was over
+    # before the read: a write later in the same second would otherwise
+    # carry the same date. Until then it is rounded down and only the ETag
+    # can revalidate.
+    second = math.ceil(modified_at)
+    if second > read_at:
+        second = math.floor(modified_at)
+    return Version(
+        version,
+        datetime.fromtimestamp(modified_at, timezone.utc),
+        datetime.fromtimestamp(second, timezone.utc),
+    )
+
+
+def etag(version: Version, *parts) -> str:
+    """
+    Builds a strong ETag from the data version and whatever else the
+    representation depends on (query string, id, day).
+    """
+    digest = hashlib.sha1("\x1f".join(str(p) for p in parts).encode()).hexdigest()[:16]
+    return f'"{version.version}-{digest}"'
+
+
+def _if_modified_since(request: Request, version: Version) -> bool:
+    header = request.headers.get("if-modified-since")
+    if header is None:
+        return False
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    return since.tzinfo is not None and version.modified_at < since
+
+
+def is_not_modified(request: Request, tag: str, version: Version) -> bool:
+    """
+    Evaluates the conditional request headers. If-None-Match wins over
+    If-Modified-Since when both are sent.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [t.strip() for t in if_none_match.split(",")]
+        return "*" in tags or tag in tags or f"W/{tag}" in tags
+    return _if_modified_since(request, version)
+
+
+def set_headers(response: Response, tag: str, version: Version):
+    response.headers["ETag"] = tag
+    response.headers["Last-Modified"] = format_datetime(version.last_modified, usegmt=True)
+    # Cacheable, but always revalidated, or browsers would reuse the list
+    # heuristically from Last-Modified without asking
+    response.headers["Cache-Control"] = "no-cache"
+
+
+def not_modified(tag: str, version: Version) -> Response:
+    response = Response(status_code=304)
+    set_headers(response, tag, version)
+    return response
+
+
+def conditional(request: Request, response: Response, version: Version, *parts) -> Optional[Response]:
+    """
+    Returns a 304 response when the client's copy is current. Otherwise sets
+    the validators on response and returns None so the handler carries on.
+    """
+    tag = etag(version, *parts)
+    if is_not_modified(request, tag, version):
+        return not_modified(tag, version)
+    set_headers(response, tag, version)
+    return None
@@ -0,0 +1,99 @@
+import contextvars
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Callable, List, Tuple
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class WriteQueue:
+    """
+    Serializes every write onto one dedicated SQLite connection.
+
+    Callers submit an operation (a callable taking a Session) and get a Future
+    back. A single thread applies operations in submission order; whatever is
+    already queued when it wakes up is applied in one transaction and committed
+    together, after which each caller's future is resolved.
+    """
+
+    def __init__(self, engine, max_batch: int = 64):
+        self.engine = engine
+        self.max_batch = max_batch
+        self.batches = 0
+        self.writes = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._connection = None
+
+    def start(self):
+        self._connection = self.engine.connect()
+        self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Applies everything already submitted, then closes the connection.
+        """
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._connection.close()
+
+    def submit(self, op: Callable[[Session], object]) -> Future:
+        future = Future()
+        # op runs in the caller's context, so its statements count towards
+        # the caller's request
+        self._queue.put((contextvars.copy_context(), op, future))
+        return future
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            stopping = False
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            batch = [item for item in batch if item[-1].set_running_or_notify_cancel()]
+            if batch:
+                self._apply(batch)
+            if stopping:
+                return
+
+    def _apply(self, batch: List[Tuple[contextvars.Context, Callable, Future]]):
+        session = Session(bind=self._connection, autoflush=False, expire_on_commit=False)
+        try:
+            results = [context.run(op, session) for context, op, _ in batch]
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            session.close()
+            if len(batch) == 1:
+                batch[0][-1].set_exception(e)
+                return
+            # The whole group was rolled back; retry each operation in its own
+            # transaction so only the failing caller sees the error
+            logger.warning("Group commit of %d writes failed, retrying individually", len(batch))
+            for item in batch:
+                self._apply([item])
+            return
+        finally:
+            session.close()
+
+        self.batches += 1
+        self.writes += len(batch)
+        for (_, _, future), result in zip(batch, results):
+            future.set_result(result)
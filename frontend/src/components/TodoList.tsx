@@ -9,9 +9,19 @@ export default function TodoList() {
   const [todos, setTodos] = useState<TodoType[]>([]);
 
   useEffect(() => {
-    fetch('http://localhost:8000/todos/')
-      .then((res) => res.json())
-      .then((data) => setTodos(data));
+    // The list is paged; follow X-Next-Cursor until the last page, showing
+    // each page as it arrives
+    const loadPage = (url: string, loaded: TodoType[]): Promise<void> =>
+      fetch(url).then(async (res) => {
+        const page: TodoType[] = await res.json();
+        const all = [...loaded, ...page];
+        setTodos(all);
+        const cursor = res.headers?.get('X-Next-Cursor');
+        if (cursor) {
+          return loadPage(`http://localhost:8000/todos/?cursor=${encodeURIComponent(cursor)}`, all);
+        }
+      });
+    loadPage('http://localhost:8000/todos/', []);
   }, []);
 
   const handleAdd = (title: string, description: string) => {
@@ -125,6 +125,34 @@ describe('TodoList Component', () => {
       expect(screen.getByTestId('todo-title-2')).toHaveTextContent('Test Todo 2');
     });
 
+    it('follows the cursor to load every page', async () => {
+      mockedFetch
+        .mockResolvedValueOnce({
+          ok: true,
+          headers: { get: (name: string) => (name === 'X-Next-Cursor' ? 'abc' : null) },
+          json: async () => [mockTodos[0]]
+        } as Response)
+        .mockResolvedValueOnce({
+          ok: true,
+          headers: { get: () => null },
+          json: async () => [mockTodos[1]]
+        } as Response);
+
+      await act(async () => {
+        render(<TodoList />);
+      });
+
+      await waitFor(() => {
+        expect(mockedFetch).toHaveBeenCalledWith('http://localhost:8000/todos/?cursor=abc');
+      });
+
+      await waitFor(() => {
+        expect(screen.getByTestId('todo-1')).toBeInTheDocument();
+        expect(screen.getByTestId('todo-2')).toBeInTheDocument();
+      });
+      expect(mockedFetch).toHaveBeenCalledTimes(2);
+    });
+
     it('handles empty todo list', async () => {
       mockedFetch.mockResolvedValueOnce({
         ok: true,